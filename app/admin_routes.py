@@ -1,16 +1,45 @@
 from fastapi import APIRouter, Request, Form, Depends, HTTPException, status
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse
 from fastapi.exceptions import HTTPException
-from auth import hash_password, verify_password, create_access_token, verify_token, ACCESS_TOKEN_EXPIRE_MINUTES, get_user_role
+from auth import create_access_token, verify_token, ACCESS_TOKEN_EXPIRE_MINUTES, get_user_role
 from models import UserRole
-from crud import get_user_by_email, get_all_users, get_all_reviews_with_user_info
-from routes import get_current_user_with_role
-from datetime import timedelta
+from async_crud import get_all_users, get_reviews_page, get_sentiment_rollups, stream_reviews
+from review_columns import SENTIMENT_LABELS
+from rollups import ROLLUP_GRANULARITIES, ALL_USERS, bucket_start
+from async_database import get_async_pool_stats
+from database import get_pool_stats
+from user_cache import user_cache
+from routes import get_current_user_with_role, model_manager, review_writer, password_pool
+from model_manager import ModelNotReadyError
+from datetime import date, datetime, timedelta
+from typing import Optional
+import csv
+import io
+import json
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 
+# Review listing page sizes
+ADMIN_REVIEWS_PAGE_SIZE = 50
+ADMIN_REVIEWS_MAX_PAGE_SIZE = 200
+
+# Analytics ranges: default span and the most buckets one request may cover
+ANALYTICS_DEFAULT_SPAN = {"hour": timedelta(hours=48), "day": timedelta(days=30)}
+ANALYTICS_MAX_BUCKETS = 1000
+
+# Review exports: rows fetched and written per chunk
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_FORMATS = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+EXPORT_COLUMNS = (
+    ["id", "created_at", "user_id", "user_name", "user_email", "review_text", "predicted_sentiment"]
+    + [f"confidence_{label}" for label in SENTIMENT_LABELS]
+    + ["model_version"]
+)
+# Spreadsheets run CSV cells starting with these as formulas
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
 # Remove the admin login page and endpoint since we're using unified login
 
 # Dependency to get current admin
@@ -23,9 +52,12 @@ def get_current_admin(request: Request):
 # Admin dashboard
 @router.get("/admin/dashboard", response_class=HTMLResponse)
 async def admin_dashboard(request: Request, admin: str = Depends(get_current_admin)):
-    users = get_all_users()
-    
-    reviews = get_all_reviews_with_user_info()
+    # Reviews are paged in by the dashboard script from /admin/api/reviews
+    try:
+        users = await get_all_users()
+    except Exception as e:
+        print(f"Database error: {e}")
+        users = []
     
     response = templates.TemplateResponse(
         "admin_dashboard.html", 
@@ -33,7 +65,7 @@ async def admin_dashboard(request: Request, admin: str = Depends(get_current_adm
             "request": request, 
             "admin": admin,
             "users": users,
-            "reviews": reviews
+            "page_size": ADMIN_REVIEWS_PAGE_SIZE
         }
     )
     
@@ -44,6 +76,210 @@ async def admin_dashboard(request: Request, admin: str = Depends(get_current_adm
     
     return response
 
+# Reviews, newest first, one keyset page at a time.
+# Pass the returned next_cursor back as `cursor` to get the following page.
+@router.get("/admin/api/reviews")
+async def admin_reviews(request: Request, admin: str = Depends(get_current_admin), limit: int = ADMIN_REVIEWS_PAGE_SIZE,
+                        cursor: Optional[str] = None, sentiment: Optional[str] = None,
+                        date_from: Optional[date] = None, date_to: Optional[date] = None):
+    limit = max(1, min(limit, ADMIN_REVIEWS_MAX_PAGE_SIZE))
+
+    start, end = review_date_range(date_from, date_to)
+
+    try:
+        reviews, next_cursor = await get_reviews_page(limit, cursor, sentiment or None, start, end)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except Exception as e:
+        print(f"Database error: {e}")
+        return JSONResponse(status_code=500, content={"error": "Failed to fetch reviews"})
+
+    return {"reviews": reviews, "next_cursor": next_cursor}
+
+def review_date_range(date_from: Optional[date], date_to: Optional[date]):
+    # date_to is inclusive, so the range ends at the start of the following day
+    start = datetime.combine(date_from, datetime.min.time()) if date_from else None
+    end = datetime.combine(date_to + timedelta(days=1), datetime.min.time()) if date_to else None
+    return start, end
+
+def export_record(review):
+    # One flat record per review; legacy JSON-only rows come out the same shape
+    results = review["sentiment_results"]
+    confidences = results.get("confidences", {})
+    return {
+        "id": review["id"],
+        "created_at": review["created_at"].isoformat(),
+        "user_id": review["user_id"],
+        "user_name": review["user_name"],
+        "user_email": review["user_email"],
+        "review_text": review["review_text"],
+        "predicted_sentiment": results.get("predicted_sentiment"),
+        **{f"confidence_{label}": confidences.get(label) for label in SENTIMENT_LABELS},
+        "model_version": results.get("model_version")
+    }
+
+def csv_safe(value):
+    # Review text and user names are user input; quote them out of formula
+    # position. NDJSON is not opened by spreadsheets and stays as stored.
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+async def export_chunks(export_format, first_chunk, chunks):
+    # Encodes each chunk of reviews as soon as it arrives
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+
+    def encode(reviews):
+        if export_format == "ndjson":
+            return "".join(json.dumps(export_record(review)) + "\n" for review in reviews)
+        writer.writerows({column: csv_safe(value) for column, value in export_record(review).items()}
+                         for review in reviews)
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+
+    try:
+        if export_format == "csv":
+            writer.writeheader()
+        yield encode(first_chunk)
+        async for reviews in chunks:
+            yield encode(reviews)
+    except Exception as e:
+        # The status line is already sent; the client sees a truncated file
+        print(f"Error streaming review export: {e}")
+        raise
+    finally:
+        # Releases the database connection right away if the client went away
+        await chunks.aclose()
+
+# All matching reviews as a CSV or NDJSON download, newest first. Rows are
+# streamed from an unbuffered cursor, so memory use does not grow with the export.
+@router.get("/admin/api/reviews/export")
+async def admin_reviews_export(request: Request, admin: str = Depends(get_current_admin), format: str = "csv",
+                               sentiment: Optional[str] = None,
+                               date_from: Optional[date] = None, date_to: Optional[date] = None):
+    if format not in EXPORT_FORMATS:
+        return JSONResponse(status_code=400, content={"error": f"format must be one of {', '.join(EXPORT_FORMATS)}"})
+
+    start, end = review_date_range(date_from, date_to)
+    chunks = stream_reviews(sentiment or None, start, end, EXPORT_CHUNK_SIZE)
+
+    # Read the first chunk up front, so a database failure still gets an error status
+    try:
+        first_chunk = await chunks.__anext__()
+    except StopAsyncIteration:
+        first_chunk = []
+    except Exception as e:
+        print(f"Database error: {e}")
+        return JSONResponse(status_code=500, content={"error": "Failed to export reviews"})
+
+    filename = f"reviews-{datetime.now():%Y%m%d-%H%M%S}.{format}"
+    return StreamingResponse(
+        export_chunks(format, first_chunk, chunks),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"}
+    )
+
+# Sentiment trends from the rollup tables: per bucket, the review count and mean
+# confidence of each predicted label. Cost depends on the range, not the table size.
+@router.get("/admin/api/analytics")
+async def admin_analytics(request: Request, admin: str = Depends(get_current_admin), granularity: str = "day",
+                          date_from: Optional[datetime] = None, date_to: Optional[datetime] = None,
+                          user_id: int = ALL_USERS):
+    if granularity not in ROLLUP_GRANULARITIES:
+        return JSONResponse(status_code=400, content={"error": f"granularity must be one of {', '.join(ROLLUP_GRANULARITIES)}"})
+
+    step = timedelta(hours=1) if granularity == "hour" else timedelta(days=1)
+    end = bucket_start(date_to or datetime.now(), granularity) + step
+    start = bucket_start(date_from, granularity) if date_from else end - ANALYTICS_DEFAULT_SPAN[granularity]
+    if start >= end:
+        return JSONResponse(status_code=400, content={"error": "date_from must be before date_to"})
+    if (end - start) / step > ANALYTICS_MAX_BUCKETS:
+        return JSONResponse(status_code=400, content={"error": f"At most {ANALYTICS_MAX_BUCKETS} buckets per request"})
+
+    try:
+        rows = await get_sentiment_rollups(granularity, user_id, start, end)
+    except Exception as e:
+        print(f"Database error: {e}")
+        return JSONResponse(status_code=500, content={"error": "Failed to fetch analytics"})
+
+    # Every bucket in the range, so charts don't skip the ones without reviews
+    buckets = {}
+    bucket = start
+    while bucket < end:
+        buckets[bucket] = {"bucket_start": bucket, "total": 0,
+                           "counts": {label: 0 for label in SENTIMENT_LABELS},
+                           "mean_confidence": {label: None for label in SENTIMENT_LABELS}}
+        bucket += step
+    totals = {label: (0, 0.0) for label in SENTIMENT_LABELS}
+    for row in rows:
+        label = row["predicted_sentiment"]
+        bucket = buckets[row["bucket_start"]]
+        bucket["total"] += row["review_count"]
+        bucket["counts"][label] = row["review_count"]
+        bucket["mean_confidence"][label] = row["confidence_sum"] / row["review_count"] if row["review_count"] else None
+
+        count, confidence_sum = totals.get(label, (0, 0.0))
+        totals[label] = (count + row["review_count"], confidence_sum + row["confidence_sum"])
+
+    return {
+        "granularity": granularity,
+        "user_id": user_id,
+        "start": start,
+        "end": end,
+        "buckets": list(buckets.values()),
+        "totals": {
+            label: {"count": count, "mean_confidence": confidence_sum / count if count else None}
+            for label, (count, confidence_sum) in totals.items()
+        }
+    }
+
+# Serving metrics
+@router.get("/admin/api/metrics")
+async def admin_metrics(request: Request, admin: str = Depends(get_current_admin)):
+    return {
+        **model_manager.stats(),
+        "review_writer": review_writer.stats(),
+        "user_cache": user_cache.stats(),
+        "password_pool": password_pool.stats(),
+        "db_pool": get_pool_stats(),
+        "async_db_pool": get_async_pool_stats()
+    }
+
+# Model registry: the published versions, the loaded ones, which one is live and the canary
+@router.get("/admin/api/models")
+async def admin_models(request: Request, admin: str = Depends(get_current_admin)):
+    return model_manager.registry_status()
+
+async def apply_model_change(change):
+    # Waits until this worker has loaded and switched; the others follow registry.json
+    try:
+        return await change
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except ModelNotReadyError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)}, headers={"Retry-After": "5"})
+
+# Make a published version live for all traffic (also promotes a canary)
+@router.post("/admin/api/models/activate")
+async def admin_models_activate(request: Request, version: str, admin: str = Depends(get_current_admin)):
+    return await apply_model_change(model_manager.update_registry(active=version))
+
+# Send percent of the traffic to version; percent 0 ends the canary
+@router.post("/admin/api/models/canary")
+async def admin_models_canary(request: Request, version: Optional[str] = None, percent: float = 0,
+                              admin: str = Depends(get_current_admin)):
+    if not 0 <= percent <= 100:
+        return JSONResponse(status_code=400, content={"error": "percent must be between 0 and 100"})
+    return await apply_model_change(model_manager.update_registry(canary=version, canary_percent=percent))
+
+# Switch back to the previously active version, which is still loaded
+@router.post("/admin/api/models/rollback")
+async def admin_models_rollback(request: Request, admin: str = Depends(get_current_admin)):
+    return await apply_model_change(model_manager.rollback())
+
 # Admin logout - now uses the unified logout
 @router.get("/admin/logout")
 async def admin_logout(request: Request):
@@ -0,0 +1,240 @@
+import base64
+import json
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
+from aiomysql import DictCursor, SSDictCursor, DataError, IntegrityError
+from async_database import get_async_connection, EXPORT_NET_WRITE_TIMEOUT_SECONDS
+from models import UserRole, ReviewResponse
+from rollups import rollup_rows, upsert_rollups_statement
+from user_cache import user_cache
+from review_columns import RESULT_COLUMNS_SQL, RESULT_SELECT_SQL, REVIEW_PLACEHOLDERS, result_column_values, results_from_row
+
+# Asyncio counterparts of crud.py for the request handlers.
+# Unlike crud.py, database errors propagate so each route can map them to its own response.
+
+async def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
+    async with get_async_connection() as connection:
+        async with connection.cursor(DictCursor) as cursor:
+            await cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
+            return await cursor.fetchone()
+
+async def get_cached_user(email: str) -> Optional[Dict[str, Any]]:
+    # id, name, email and role, from the shared TTL cache when possible
+    user = user_cache.get(email)
+    if user is None:
+        user = await get_user_by_email(email)
+        if user:
+            user_cache.put(user)
+    return user
+
+async def email_or_cnic_registered(email: str, cnic: str) -> bool:
+    async with get_async_connection() as connection:
+        async with connection.cursor() as cursor:
+            await cursor.execute("SELECT id FROM users WHERE email = %s OR cnic = %s LIMIT 1", (email, cnic))
+            return await cursor.fetchone() is not None
+
+async def create_user(name: str, email: str, cnic: str, hashed_password: str, role: UserRole = UserRole.USER) -> int:
+    async with get_async_connection() as connection:
+        async with connection.cursor() as cursor:
+            await cursor.execute(
+                "INSERT INTO users (name, email, cnic, password, role) VALUES (%s, %s, %s, %s, %s)",
+                (name, email, cnic, hashed_password, role.value)
+            )
+            user_id = cursor.lastrowid
+
+    # Drop anything cached for a user that previously had this email
+    user_cache.invalidate(email)
+    return user_id
+
+async def get_all_users() -> List[Dict[str, Any]]:
+    async with get_async_connection() as connection:
+        async with connection.cursor(DictCursor) as cursor:
+            await cursor.execute("SELECT id, name, email, cnic, role, created_at FROM users ORDER BY created_at DESC")
+            return await cursor.fetchall()
+
+def encode_review_cursor(review: Dict[str, Any]) -> str:
+    # Opaque position after `review` in (created_at, id) order
+    payload = json.dumps([review["created_at"].isoformat(), review["id"]])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_review_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, review_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(review_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def review_filters(sentiment: Optional[str], date_from: Optional[datetime], date_to: Optional[datetime]
+                   ) -> Tuple[List[str], List[Any]]:
+    # WHERE conditions on reviews aliased as r, and their parameters
+    conditions, params = [], []
+    if sentiment:
+        conditions.append("r.predicted_sentiment = %s")
+        params.append(sentiment)
+    if date_from:
+        conditions.append("r.created_at >= %s")
+        params.append(date_from)
+    if date_to:
+        conditions.append("r.created_at < %s")
+        params.append(date_to)
+    return conditions, params
+
+async def get_reviews_page(limit: int = 50, cursor: Optional[str] = None, sentiment: Optional[str] = None,
+                           date_from: Optional[datetime] = None, date_to: Optional[datetime] = None
+                           ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    # Newest first. Keyset pagination seeks straight to the cursor through the
+    # (created_at, id) indexes, so every page costs the same however deep it is.
+    conditions, params = review_filters(sentiment, date_from, date_to)
+    if cursor:
+        created_at, review_id = decode_review_cursor(cursor)
+        # Spelled out: MySQL does not reliably use an index range for a row comparison
+        conditions.append("(r.created_at < %s OR (r.created_at = %s AND r.id < %s))")
+        params.extend((created_at, created_at, review_id))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    async with get_async_connection() as connection:
+        async with connection.cursor(DictCursor) as db_cursor:
+            # One extra row tells whether another page follows
+            await db_cursor.execute(
+                f"""
+                SELECT r.id, r.user_id, r.review_text, r.created_at, {RESULT_SELECT_SQL},
+                       u.name as user_name, u.email as user_email
+                FROM reviews r
+                JOIN users u ON r.user_id = u.id
+                {where}
+                ORDER BY r.created_at DESC, r.id DESC
+                LIMIT %s
+                """,
+                params + [limit + 1]
+            )
+            reviews = await db_cursor.fetchall()
+
+    next_cursor = None
+    if len(reviews) > limit:
+        reviews = reviews[:limit]
+        next_cursor = encode_review_cursor(reviews[-1])
+
+    for review in reviews:
+        review['sentiment_results'] = results_from_row(review)
+    return reviews, next_cursor
+
+async def stream_reviews(sentiment: Optional[str] = None, date_from: Optional[datetime] = None,
+                         date_to: Optional[datetime] = None, chunk_size: int = 1000
+                         ) -> AsyncIterator[List[Dict[str, Any]]]:
+    # Yields the matching reviews, newest first, chunk_size rows at a time.
+    # The unbuffered cursor reads rows off the socket as they are consumed, so
+    # memory stays at one chunk however many reviews match. The connection is
+    # busy until the last row is read.
+    conditions, params = review_filters(sentiment, date_from, date_to)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    async with get_async_connection() as connection:
+        async with connection.cursor() as cursor:
+            # A slow client stalls the reads; give the server longer than the default 60s
+            await cursor.execute("SET SESSION net_write_timeout = %s", (EXPORT_NET_WRITE_TIMEOUT_SECONDS,))
+
+        cursor = await connection.cursor(SSDictCursor)
+        try:
+            await cursor.execute(
+                f"""
+                SELECT r.id, r.user_id, r.review_text, r.created_at, {RESULT_SELECT_SQL},
+                       u.name as user_name, u.email as user_email
+                FROM reviews r
+                JOIN users u ON r.user_id = u.id
+                {where}
+                ORDER BY r.created_at DESC, r.id DESC
+                """,
+                params
+            )
+            while True:
+                rows = await cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    row['sentiment_results'] = results_from_row(row)
+                yield rows
+            await cursor.close()
+
+            # The connection goes back to the pool; other users get the server default again
+            async with connection.cursor() as cursor:
+                await cursor.execute("SET SESSION net_write_timeout = DEFAULT")
+        except BaseException:
+            # Abandoned mid-result (client gone, cancelled or failed): closing the
+            # cursor would read every remaining row first, so drop the connection
+            # instead; the pool discards closed connections
+            connection.close()
+            raise
+
+async def get_sentiment_rollups(granularity: str, user_id: int, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+    # Reads only the rollup rows in the range, however many reviews they summarize
+    async with get_async_connection() as connection:
+        async with connection.cursor(DictCursor) as cursor:
+            await cursor.execute(
+                """
+                SELECT bucket_start, predicted_sentiment, review_count, confidence_sum
+                FROM sentiment_rollups
+                WHERE granularity = %s AND user_id = %s AND bucket_start >= %s AND bucket_start < %s
+                ORDER BY bucket_start
+                """,
+                (granularity, user_id, start, end)
+            )
+            return await cursor.fetchall()
+
+async def get_recent_reviews_by_user(user_id: int, limit: int = 5) -> List[Dict[str, Any]]:
+    async with get_async_connection() as connection:
+        async with connection.cursor(DictCursor) as cursor:
+            await cursor.execute(
+                "SELECT id, review_text, created_at FROM reviews WHERE user_id = %s ORDER BY created_at DESC, id DESC LIMIT %s",
+                (user_id, limit)
+            )
+            return await cursor.fetchall()
+
+# Errors caused by one row (text too long for the column, unknown user_id, ...)
+# rather than by the connection; retrying the same batch cannot succeed
+REVIEW_ROW_ERRORS = (DataError, IntegrityError)
+
+async def insert_reviews(entries: List[Tuple[int, str, Dict[str, Any]]]) -> Tuple[int, datetime, int]:
+    # entries are (user_id, review_text, sentiment_results). All of them go in
+    # one multi-row INSERT, and their rollup increments commit in the same
+    # transaction, so the rollups always match the reviews table.
+    # Returns the first new id, the shared created_at and the row count.
+    placeholders = ", ".join([f"({REVIEW_PLACEHOLDERS})"] * len(entries))
+    params = []
+    for user_id, review_text, results in entries:
+        params.extend((user_id, review_text) + result_column_values(results))
+
+    async with get_async_connection() as connection:
+        async with connection.cursor() as cursor:
+            await connection.begin()
+            try:
+                await cursor.execute(
+                    f"INSERT INTO reviews (user_id, review_text, {RESULT_COLUMNS_SQL}) VALUES {placeholders}",
+                    params
+                )
+                first_id, rowcount = cursor.lastrowid, cursor.rowcount
+
+                # Rows of one statement share created_at
+                await cursor.execute("SELECT created_at FROM reviews WHERE id = %s", (first_id,))
+                (created_at,) = await cursor.fetchone()
+
+                rows = rollup_rows(created_at, [(user_id, results) for user_id, _, results in entries])
+                await cursor.execute(*upsert_rollups_statement(rows))
+                await connection.commit()
+            except Exception:
+                await connection.rollback()
+                raise
+    return first_id, created_at, rowcount
+
+async def create_review(user_id: int, review_text: str, sentiment_results: Dict[str, Any]) -> ReviewResponse:
+    review_id, created_at, _ = await insert_reviews([(user_id, review_text, sentiment_results)])
+    return ReviewResponse(id=review_id, user_id=user_id, review_text=review_text,
+                          sentiment_results=sentiment_results, created_at=created_at)
+
+async def create_reviews(user_id: int, review_texts: List[str], sentiment_results: List[Dict[str, Any]]) -> int:
+    if not review_texts:
+        return 0
+
+    _, _, rowcount = await insert_reviews([
+        (user_id, review_text, results) for review_text, results in zip(review_texts, sentiment_results)
+    ])
+    return rowcount
@@ -0,0 +1,61 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+import aiomysql
+from dotenv import load_dotenv
+from database import DB_POOL_SIZE, DB_POOL_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE_SECONDS
+
+load_dotenv()
+
+# Seconds the server waits on a client that is slow to read a streamed result (exports)
+EXPORT_NET_WRITE_TIMEOUT_SECONDS = int(os.getenv("EXPORT_NET_WRITE_TIMEOUT_SECONDS", "600"))
+
+_pool = None
+_pool_lock = None
+
+async def init_async_pool():
+    global _pool, _pool_lock
+    if _pool_lock is None:
+        _pool_lock = asyncio.Lock()
+
+    async with _pool_lock:
+        if _pool is None:
+            # autocommit keeps plain reads from holding a transaction open;
+            # writes that span statements use begin()/commit() explicitly
+            _pool = await aiomysql.create_pool(
+                host=os.getenv("DB_HOST", "localhost"),
+                user=os.getenv("DB_USER", "root"),
+                password=os.getenv("DB_PASSWORD", ""),
+                db=os.getenv("DB_NAME", "payfast_sentiment"),
+                minsize=1,
+                maxsize=DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW,
+                pool_recycle=int(DB_POOL_RECYCLE_SECONDS),
+                autocommit=True
+            )
+    return _pool
+
+async def close_async_pool():
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        await _pool.wait_closed()
+        _pool = None
+
+@asynccontextmanager
+async def get_async_connection():
+    pool = _pool or await init_async_pool()
+    connection = await asyncio.wait_for(pool.acquire(), DB_POOL_TIMEOUT)
+    try:
+        yield connection
+    finally:
+        pool.release(connection)
+
+def get_async_pool_stats():
+    if _pool is None:
+        return {"open": 0, "idle": 0, "checked_out": 0, "max_size": DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW}
+    return {
+        "open": _pool.size,
+        "idle": _pool.freesize,
+        "checked_out": _pool.size - _pool.freesize,
+        "max_size": _pool.maxsize
+    }
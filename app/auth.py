@@ -1,17 +1,25 @@
+import os
 import bcrypt
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from typing import Optional
+from dotenv import load_dotenv
 from models import UserRole
 
+load_dotenv()
+
 # JWT settings
 SECRET_KEY = "your-secret-key-change-in-production"  # Change this to a secure random key
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# bcrypt cost factor for new hashes; each step doubles the time per hash.
+# Existing hashes keep the cost they were created with.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
 def hash_password(password: str) -> str:
     password_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     hashed_password = bcrypt.hashpw(password_bytes, salt)
     return hashed_password.decode('utf-8')
 
@@ -30,19 +38,25 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str):
+def decode_token(token: str) -> Optional[dict]:
+    # All claims of a valid token: sub (email) plus uid and role for tokens issued at login
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            return None
-        return email
     except JWTError:
         return None
+    if payload.get("sub") is None:
+        return None
+    return payload
+
+def verify_token(token: str):
+    payload = decode_token(token)
+    if payload is None:
+        return None
+    return payload["sub"]
 
 def get_user_role(email: str) -> Optional[UserRole]:
-    from crud import get_user_by_email
-    user = get_user_by_email(email)
+    from crud import get_cached_user
+    user = get_cached_user(email)
     if user:
         return UserRole(user["role"])
     return None
\ No newline at end of file
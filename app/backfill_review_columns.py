@@ -0,0 +1,77 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import time
+from mysql.connector import Error
+from database import get_db_connection, create_tables
+from review_columns import SENTIMENT_LABELS
+
+# Copies predictions of reviews written before the typed columns existed out of
+# their sentiment_results JSON. Runs in primary-key ranges, one short transaction
+# each, so it can run against a live database; rows that already have
+# predicted_sentiment are skipped, so it can be stopped and re-run at any time.
+#
+#   python backfill_review_columns.py --batch-size 5000 --sleep 0.1
+#
+# The extraction runs inside MySQL, so the JSON never travels to this process.
+
+def backfill(batch_size, sleep_seconds, start_id=0, model_version=None, clear_json=False):
+    create_tables()
+
+    connection = get_db_connection()
+    if connection is None:
+        return False
+    cursor = connection.cursor()
+
+    assignments = ["predicted_sentiment = sentiment_results->>'$.predicted_sentiment'"]
+    assignments += [f"confidence_{label} = sentiment_results->>'$.confidences.{label}'" for label in SENTIMENT_LABELS]
+    params = []
+    if model_version:
+        assignments.append("model_version = %s")
+        params.append(model_version)
+    if clear_json:
+        assignments.append("sentiment_results = NULL")
+    update = (
+        f"UPDATE reviews SET {', '.join(assignments)} "
+        "WHERE id >= %s AND id < %s AND predicted_sentiment IS NULL AND sentiment_results IS NOT NULL"
+    )
+
+    try:
+        cursor.execute("SELECT MAX(id) FROM reviews")
+        max_id = cursor.fetchone()[0] or 0
+
+        updated = 0
+        started = time.perf_counter()
+        for low in range(start_id, max_id + 1, batch_size):
+            cursor.execute(update, params + [low, low + batch_size])
+            connection.commit()
+            updated += cursor.rowcount
+
+            elapsed = time.perf_counter() - started
+            print(f"ids < {low + batch_size}: {updated} rows updated ({updated / max(elapsed, 1e-9):.0f} rows/s)")
+            if sleep_seconds:
+                time.sleep(sleep_seconds)
+
+        cursor.execute("SELECT COUNT(*) FROM reviews WHERE predicted_sentiment IS NULL")
+        remaining = cursor.fetchone()[0]
+        print(f"Done: {updated} rows updated, {remaining} rows still without a predicted_sentiment")
+        return True
+    except Error as e:
+        print(f"Database error: {e}")
+        connection.rollback()
+        return False
+    finally:
+        cursor.close()
+        connection.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill typed sentiment columns from sentiment_results JSON")
+    parser.add_argument("--batch-size", type=int, default=5000, help="primary-key range per transaction")
+    parser.add_argument("--sleep", type=float, default=0.0, help="pause between batches, in seconds")
+    parser.add_argument("--start-id", type=int, default=0)
+    parser.add_argument("--model-version", help="version to record for the backfilled rows (default: NULL)")
+    parser.add_argument("--clear-json", action="store_true", help="drop the JSON of rows once converted")
+    args = parser.parse_args()
+    sys.exit(0 if backfill(args.batch_size, args.sleep, args.start_id, args.model_version, args.clear_json) else 1)
@@ -0,0 +1,140 @@
+import asyncio
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Batching settings
+PREDICT_MAX_BATCH_SIZE = int(os.getenv("PREDICT_MAX_BATCH_SIZE", "32"))
+PREDICT_MAX_WAIT_MS = float(os.getenv("PREDICT_MAX_WAIT_MS", "5"))
+
+# Collects concurrent prediction requests into one batched forward pass.
+# The first request opens a batch window; the batch runs as soon as it holds
+# max_batch_size texts or max_wait_ms has passed, whichever comes first.
+# predict_fn is a coroutine function that gets the list of texts and returns
+# one result per text, in order. Up to max_concurrent_batches batches run at
+# once; while they do, new requests keep queueing and form the next batch.
+class MicroBatcher:
+    def __init__(self, predict_fn, max_batch_size=PREDICT_MAX_BATCH_SIZE, max_wait_ms=PREDICT_MAX_WAIT_MS,
+                 max_concurrent_batches=1):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max(max_wait_ms, 0) / 1000.0
+        self.max_concurrent_batches = max(max_concurrent_batches, 1)
+        self._queue = None
+        self._worker = None
+        self._slots = None
+        self._batches = set()
+        self._collecting = []
+
+    def _ensure_worker(self):
+        # The queue and worker task are bound to the running event loop,
+        # so they are created on first use rather than at import time
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, text):
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((text, future))
+        return await future
+
+    async def run_batch(self, texts):
+        # A caller's own batch (bulk scoring) takes a slot like a collected
+        # batch does, so it queues with single requests instead of around them
+        self._ensure_worker()
+        async with self._slots:
+            return await self.predict_fn(texts)
+
+    async def _collect(self):
+        # The batch under construction lives on the instance so stop() can
+        # fail it if the worker is cancelled mid-collection
+        loop = asyncio.get_running_loop()
+        batch = self._collecting = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # Take whatever is already waiting before sleeping on the queue
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        self._collecting = []
+        return batch
+
+    async def _run(self):
+        while True:
+            # Wait for a free slot first, so requests pile up into a fuller batch
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+
+            task = asyncio.get_running_loop().create_task(self._dispatch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _dispatch(self, batch):
+        try:
+            # Skip requests whose callers have already gone away
+            batch = [(text, future) for text, future in batch if not future.done()]
+            if not batch:
+                return
+
+            try:
+                results = await self.predict_fn([text for text, _ in batch])
+            except Exception as e:
+                print(f"Batch prediction error: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        return {
+            "queued_requests": self._queue.qsize() if self._queue is not None else 0,
+            "batches_in_flight": len(self._batches),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0
+        }
+
+    async def stop(self):
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+
+        # Let running batches finish, then fail anything still waiting
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+        waiting = self._collecting
+        self._collecting = []
+        while not self._queue.empty():
+            waiting.append(self._queue.get_nowait())
+        for _, future in waiting:
+            if not future.done():
+                future.set_exception(RuntimeError("Prediction batcher stopped"))
+        self._worker = None
@@ -0,0 +1,498 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import random
+import re
+import time
+
+# Micro-benchmarks and parity checks for the serving path.
+# Every subcommand exits non-zero when its parity check fails.
+
+def legacy_clean_text(text):
+    # The original four-pass clean_text, kept as the golden reference
+    if not isinstance(text, str):
+        return ""
+    text = text.lower()
+    text = re.sub(r'<.*?>', '', text)
+    text = re.sub(r'http\S+', '', text)
+    text = re.sub(r'[^a-zA-Z\s]', '', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+# Inputs that exercise the ordering and whitespace corner cases of clean_text
+GOLDEN_TEXTS = [
+    "", "   ", "Good app!!", "good  app", "GOOD\tapp\n", "<b>Great</b> service",
+    "Visit HTTP://Example.com/Path now", "http<br>s://split.example", "ht<i>tp://x.y tail",
+    "a <unclosed tag", "multi\nline <tag\nspanning> text", "Don't stop, won't stop!",
+    "Café naïve résumé", "\u212a\u0130 unicode lowering", "tabs\x0band\x1cseparators\x85here",
+    "non\u00a0breaking\u2003spaces", "emoji \U0001F600 only", "1234 5678", "<<>>", "http",
+    "ends with url https://t.co/abc", None, 42,
+]
+
+def load_corpus(path, size):
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            return [line.rstrip("\n") for line in f]
+
+    # Synthetic reviews with a realistic mix of punctuation, tags and links
+    rng = random.Random(0)
+    words = ["good", "bad", "app", "payment", "failed", "Fast", "SLOW", "refund", "support",
+             "great!!", "worst...", "5/5", "don't", "<br>", "https://payfast.pk/help", "Ok,"]
+    return [" ".join(rng.choice(words) for _ in range(rng.randint(3, 300))) for _ in range(size)]
+
+def time_per_call(fn, items, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(items)
+        best = min(best, time.perf_counter() - start)
+    return best / max(len(items), 1)
+
+def bench_normalize(args):
+    from utils import clean_text, clean_texts
+
+    corpus = load_corpus(args.corpus, args.size)
+
+    mismatches = [text for text in GOLDEN_TEXTS + corpus if clean_text(text) != legacy_clean_text(text)]
+    if mismatches:
+        print(f"MISMATCH on {len(mismatches)} inputs, first: {mismatches[0]!r}")
+        return False
+    print(f"OK: clean_text matches the four-regex reference on {len(GOLDEN_TEXTS) + len(corpus)} inputs")
+
+    legacy = time_per_call(lambda items: [legacy_clean_text(t) for t in items], corpus, args.repeat)
+    fused = time_per_call(clean_texts, corpus, args.repeat)
+    print(f"legacy  {legacy * 1e6:8.2f} us/text")
+    print(f"fused   {fused * 1e6:8.2f} us/text  ({legacy / fused:.2f}x)")
+    return True
+
+def read_lines(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f if line.strip()]
+
+def time_batches(fn, items, batch_size, repeat):
+    # Best-of-N wall time per text when items are processed in fixed-size batches
+    batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+    return time_per_call(lambda _: [fn(batch) for batch in batches], items, repeat)
+
+def compare_probabilities(reference, probs):
+    import numpy as np
+    agreement = float((reference.argmax(axis=1) == probs.argmax(axis=1)).mean())
+    diff = np.abs(reference - probs)
+    return agreement, float(diff.max()), float(diff.mean())
+
+def bench_sequence_modes(args):
+    from model_loader import load_model_components
+    from predict import SEQUENCE_MODES, encode_texts, forward_probabilities
+
+    model, tokenizer, _, device, max_len = load_model_components(args.model_dir)
+    padded = encode_texts(read_lines(args.corpus), tokenizer, max_len)
+    lengths = (padded != 0).sum(axis=1)
+    print(f"{len(padded)} texts, mean length {lengths.mean():.1f} tokens, max_len {max_len}")
+
+    reference = forward_probabilities(model, padded, device, "padded")
+    print(f"{'mode':10} {'us/text':>10} {'agreement':>10} {'max |dp|':>10} {'mean |dp|':>10}")
+    for mode in SEQUENCE_MODES:
+        probs = forward_probabilities(model, padded, device, mode)
+        agreement, max_diff, mean_diff = compare_probabilities(reference, probs)
+        elapsed = time_batches(lambda batch: forward_probabilities(model, batch, device, mode),
+                               padded, args.batch_size, args.repeat)
+        print(f"{mode:10} {elapsed * 1e6:10.1f} {agreement:10.2%} {max_diff:10.4f} {mean_diff:10.4f}")
+    return True
+
+def read_heldout(path):
+    # CSV with a text column and an optional label column
+    import csv
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        rows = [row for row in csv.DictReader(f) if (row.get("text") or "").strip()]
+    labels = [row["label"] for row in rows] if rows and "label" in rows[0] else None
+    return [row["text"] for row in rows], labels
+
+def process_rss_mb(code):
+    # Resident memory of a fresh interpreter after running `code`
+    import subprocess
+    script = code + "\nprint([l for l in open('/proc/self/status') if l.startswith('VmRSS')][0].split()[1])"
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    return int(output.stdout.strip().splitlines()[-1]) / 1024
+
+def bench_quantization(args):
+    import numpy as np
+    from model_loader import load_model_components
+    from predict import encode_texts, forward_probabilities
+
+    texts, labels = read_heldout(args.heldout)
+    variants = {}
+    for quantization in ("none", "dynamic_int8"):
+        variants[quantization] = load_model_components(args.model_dir, quantization)
+
+    _, tokenizer, label_encoder, _, max_len = variants["none"]
+    padded = encode_texts(texts, tokenizer, max_len)
+    reference = None
+
+    print(f"{len(texts)} held-out texts{' with labels' if labels else ''}")
+    print(f"{'variant':14} {'accuracy':>9} {'agreement':>10} {'max |dp|':>9} {'us/text b=1':>12} "
+          f"{'us/text b=' + str(args.batch_size):>13} {'RSS MB':>8}")
+    for quantization, (model, _, _, device, _) in variants.items():
+        probs = forward_probabilities(model, padded, device)
+        if reference is None:
+            reference = probs
+        agreement, max_diff, _ = compare_probabilities(reference, probs)
+
+        accuracy = "n/a"
+        if labels:
+            predicted = label_encoder.inverse_transform(probs.argmax(axis=1))
+            accuracy = f"{float(np.mean(predicted == np.asarray(labels))):.2%}"
+
+        sample = padded[:args.latency_sample]
+        single = time_batches(lambda batch: forward_probabilities(model, batch, device), sample, 1, args.repeat)
+        batched = time_batches(lambda batch: forward_probabilities(model, batch, device),
+                               sample, args.batch_size, args.repeat)
+        rss = process_rss_mb(
+            f"from model_loader import load_model_components\n"
+            f"components = load_model_components({args.model_dir!r}, {quantization!r})"
+        )
+        print(f"{quantization:14} {accuracy:>9} {agreement:10.2%} {max_diff:9.5f} {single * 1e6:12.1f} "
+              f"{batched * 1e6:13.1f} {rss:8.1f}")
+    return True
+
+def bench_gate_table(args):
+    import torch
+    from model_loader import load_model_components
+    from gate_table import build_gate_table_model
+
+    model, _, _, device, max_len = load_model_components(args.model_dir, quantization="none", gate_table=False)
+    gate_model = build_gate_table_model(model)
+    generator = torch.Generator().manual_seed(0)
+
+    ok = True
+    print(f"{'steps':>5} {'batch':>5} {'lstm ms':>9} {'table ms':>9} {'speedup':>8} {'max |dlogit|':>13}")
+    for steps in args.lengths:
+        for batch_size in args.batch_sizes:
+            x = torch.randint(1, model.embedding.num_embeddings, (batch_size, steps), generator=generator).to(device)
+            with torch.no_grad():
+                max_diff = (model(x) - gate_model(x)).abs().max().item()
+                lstm_time = time_per_call(lambda items: [model(x) for _ in items], range(args.calls), args.repeat)
+                table_time = time_per_call(lambda items: [gate_model(x) for _ in items], range(args.calls), args.repeat)
+
+            ok = ok and max_diff <= args.tolerance
+            print(f"{steps:5d} {batch_size:5d} {lstm_time * 1e3:9.3f} {table_time * 1e3:9.3f} "
+                  f"{lstm_time / table_time:7.2f}x {max_diff:13.2e}")
+
+    if not ok:
+        print(f"MISMATCH: logits differ by more than {args.tolerance}")
+    return ok
+
+def bench_backends(args):
+    from model_loader import load_model_components
+    from predict import encode_texts, forward_probabilities
+    from inference_backends import INFERENCE_BACKENDS
+
+    texts = read_lines(args.corpus)
+    reference = None
+    ok = True
+
+    print(f"{len(texts)} texts, padded sequence mode")
+    print(f"{'backend':12} {'load s':>7} {'max |dp|':>9} {'agreement':>10} {'us/text b=1':>12} "
+          f"{'us/text b=' + str(args.batch_size):>13}")
+    for backend in args.backends or INFERENCE_BACKENDS:
+        # The first load of a backend converts and caches it; report the cached load
+        load_model_components(args.model_dir, "none", False, backend, "padded")
+        start = time.perf_counter()
+        model, tokenizer, _, device, max_len = load_model_components(args.model_dir, "none", False, backend, "padded")
+        load_time = time.perf_counter() - start
+
+        padded = encode_texts(texts, tokenizer, max_len)
+        probs = forward_probabilities(model, padded, device, "padded")
+        if reference is None:
+            reference = probs
+        agreement, max_diff, _ = compare_probabilities(reference, probs)
+        ok = ok and max_diff <= args.tolerance
+
+        sample = padded[:args.latency_sample]
+        single = time_batches(lambda batch: forward_probabilities(model, batch, device, "padded"), sample, 1, args.repeat)
+        batched = time_batches(lambda batch: forward_probabilities(model, batch, device, "padded"),
+                               sample, args.batch_size, args.repeat)
+        print(f"{backend:12} {load_time:7.2f} {max_diff:9.2e} {agreement:10.2%} {single * 1e6:12.1f} "
+              f"{batched * 1e6:13.1f}")
+
+    if not ok:
+        print(f"MISMATCH: probabilities differ from eager by more than {args.tolerance}")
+    return ok
+
+def run_snippet(code, env=None):
+    # Runs `code` in a fresh interpreter from the app directory and returns its last stdout line
+    import subprocess
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), env={**os.environ, **(env or {})})
+    return output.stdout.strip().splitlines()[-1]
+
+def bench_startup(args):
+    import json
+
+    ok = True
+    print(f"{'import':14} {'ms':>8}  heavy modules loaded")
+    for module in ("routes", "admin_routes", "main"):
+        best = float("inf")
+        for _ in range(args.repeat):
+            result = json.loads(run_snippet(
+                f"import json, sys, time\n"
+                f"start = time.perf_counter()\n"
+                f"import {module}\n"
+                f"elapsed = time.perf_counter() - start\n"
+                f"print(json.dumps([elapsed, [m for m in ('torch', 'tensorflow', 'keras') if m in sys.modules]]))"
+            ))
+            best = min(best, result[0])
+        heavy = result[1]
+        ok = ok and not heavy and best * 1e3 <= args.import_budget_ms
+        print(f"{module:14} {best * 1e3:8.1f}  {', '.join(heavy) or 'none'}")
+
+    # Background load plus warm-up, as the startup event runs it
+    result = json.loads(run_snippet(
+        "import asyncio, json, time\n"
+        "from model_manager import ModelManager\n"
+        "async def main():\n"
+        "    manager = ModelManager()\n"
+        "    start = time.perf_counter()\n"
+        "    await manager.wait_ready(timeout=None)\n"
+        "    ready = time.perf_counter() - start\n"
+        "    await manager.stop()\n"
+        "    return [ready, manager.status()]\n"
+        "print(json.dumps(asyncio.run(main())))",
+        env={"MODEL_DIR": args.model_dir}
+    ))
+    status = result[1]
+    print(f"model ready in {result[0]:.2f}s (load {status['load_seconds']:.2f}s, "
+          f"warm-up {status['warmup_seconds']:.2f}s)")
+
+    if not ok:
+        print(f"FAIL: imports must stay under {args.import_budget_ms} ms without torch or TensorFlow")
+    return ok
+
+def smaps_rollup_mb(pid):
+    # Rss, Pss and unique (private) memory of a process, in MB
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return fields["Rss"], fields["Pss"], fields["Private_Clean"] + fields["Private_Dirty"]
+
+def child_pids(pid):
+    children = []
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # ppid is the 2nd field after the parenthesised command name
+                    if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                        children.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                pass
+    return sorted(children)
+
+def wait_until_ready(url, workers, timeout):
+    # Requests land on random workers; enough consecutive 200s means all of them are up
+    import urllib.request
+    import urllib.error
+    deadline = time.monotonic() + timeout
+    streak = 0
+    while streak < workers * 5:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{url} not ready after {timeout}s")
+        try:
+            with urllib.request.urlopen(url, timeout=2) as response:
+                streak = streak + 1 if response.status == 200 else 0
+        except (urllib.error.URLError, ConnectionError):
+            streak = 0
+            time.sleep(0.2)
+
+def bench_memory(args):
+    import subprocess
+
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    address = ["--host", "127.0.0.1", "--port", str(args.port), "--workers", str(args.workers)]
+    launchers = {
+        # Every worker is a fresh interpreter that imports the app and loads the model itself
+        "uvicorn": [sys.executable, "-m", "uvicorn", "main:app"] + address,
+        "serve.py": [sys.executable, os.path.join(app_dir, "serve.py")] + address,
+    }
+
+    print(f"{args.workers} workers, model dir {args.model_dir}")
+    print(f"{'launcher':12} {'process':8} {'RSS MB':>8} {'PSS MB':>8} {'unique MB':>10}")
+    for mode, command in launchers.items():
+        master = subprocess.Popen(command, cwd=app_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                  env={**os.environ, "MODEL_DIR": args.model_dir, "INFERENCE_POOL_MODE": "thread"})
+        try:
+            wait_until_ready(f"http://127.0.0.1:{args.port}/health/ready", args.workers, args.timeout)
+            time.sleep(1)
+            workers = [smaps_rollup_mb(pid) for pid in child_pids(master.pid)]
+            print(f"{mode:12} {'master':8} " + "{:8.1f} {:8.1f} {:10.1f}".format(*smaps_rollup_mb(master.pid)))
+            for index, (rss, pss, unique) in enumerate(workers):
+                print(f"{mode:12} {'worker ' + str(index):8} {rss:8.1f} {pss:8.1f} {unique:10.1f}")
+            total_pss = sum(pss for _, pss, _ in workers) + smaps_rollup_mb(master.pid)[1]
+            print(f"{mode:12} {'total':8} {'':8} {total_pss:8.1f}")
+        finally:
+            master.terminate()
+            master.wait(timeout=30)
+    return True
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def bench_login_storm(args):
+    import asyncio
+    import bcrypt
+    from auth import verify_password
+    from model_manager import ModelManager
+    from password_pool import PasswordPool, PasswordPoolBusyError
+
+    password = "correct horse battery staple"
+    hashed = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=args.rounds)).decode("utf-8")
+    pool = PasswordPool(workers=args.hash_workers, max_pending=args.max_pending)
+
+    async def inline_verify(plain_password, hashed_password):
+        # What login did before: bcrypt on the event loop
+        return verify_password(plain_password, hashed_password)
+
+    async def probe(manager, stop, latencies):
+        # A steady trickle of /predict calls, made the way the route makes them
+        while not stop.is_set():
+            start = time.perf_counter()
+            await manager.submit("the delivery was quick and the support team was helpful")
+            latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(args.probe_interval_ms / 1000)
+
+    async def storm(verify, counts):
+        # Logins arrive at a fixed rate whether or not earlier ones have finished
+        async def login():
+            try:
+                await verify(password, hashed)
+                counts["accepted"] += 1
+            except PasswordPoolBusyError:
+                counts["rejected"] += 1
+
+        logins = []
+        for _ in range(int(args.duration * args.login_rate)):
+            logins.append(asyncio.create_task(login()))
+            await asyncio.sleep(1 / args.login_rate)
+        await asyncio.gather(*logins)
+
+    async def main():
+        manager = ModelManager(args.model_dir)
+        manager.start()
+        await manager.wait_ready(timeout=None)
+
+        phases = {}
+        for phase, verify in (("no logins", None), ("inline bcrypt", inline_verify), ("password pool", pool.verify)):
+            latencies = []
+            counts = {"accepted": 0, "rejected": 0}
+            stop = asyncio.Event()
+            prober = asyncio.create_task(probe(manager, stop, latencies))
+            start = time.perf_counter()
+            if verify is None:
+                await asyncio.sleep(args.duration)
+            else:
+                await storm(verify, counts)
+            elapsed = time.perf_counter() - start
+            stop.set()
+            await prober
+            phases[phase] = (latencies, counts, elapsed)
+
+        await manager.stop()
+        pool.shutdown()
+        return phases
+
+    phases = asyncio.run(main())
+    print(f"bcrypt rounds {args.rounds}, {args.login_rate:g} logins/s for {args.duration:g}s, "
+          f"{pool.workers} hash workers, at most {pool.max_pending} pending")
+    print(f"{'phase':14} {'predicts':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'logins ok':>9} {'shed':>6} {'wall s':>7}")
+    for phase, (latencies, counts, elapsed) in phases.items():
+        print(f"{phase:14} {len(latencies):8} {percentile(latencies, 0.5) * 1e3:8.1f} "
+              f"{percentile(latencies, 0.99) * 1e3:8.1f} {max(latencies) * 1e3:8.1f} "
+              f"{counts['accepted']:9} {counts['rejected']:6} {elapsed:7.1f}")
+
+    idle_p99 = percentile(phases["no logins"][0], 0.99)
+    pool_p99 = percentile(phases["password pool"][0], 0.99)
+    if pool_p99 - idle_p99 > args.p99_budget_ms / 1e3:
+        print(f"FAIL: /predict p99 rose by {(pool_p99 - idle_p99) * 1e3:.1f} ms during the login storm "
+              f"(budget {args.p99_budget_ms:g} ms)")
+        return False
+    return True
+
+if __name__ == "__main__":
+    from auth import BCRYPT_ROUNDS
+    from password_pool import PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING
+
+    parser = argparse.ArgumentParser(description="Serving path benchmarks and parity checks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    normalize = subparsers.add_parser("normalize", help="clean_text parity and throughput")
+    normalize.add_argument("--corpus", help="text file with one review per line (default: synthetic)")
+    normalize.add_argument("--size", type=int, default=5000, help="synthetic corpus size")
+    normalize.add_argument("--repeat", type=int, default=5)
+    normalize.set_defaults(func=bench_normalize)
+
+    modes = subparsers.add_parser("sequence-modes", help="padded vs truncated vs packed LSTM inference")
+    modes.add_argument("--corpus", required=True, help="text file with one review per line")
+    modes.add_argument("--model-dir", default="models")
+    modes.add_argument("--batch-size", type=int, default=32)
+    modes.add_argument("--repeat", type=int, default=3)
+    modes.set_defaults(func=bench_sequence_modes)
+
+    quantization = subparsers.add_parser("quantization", help="fp32 vs dynamic int8 accuracy, latency and memory")
+    quantization.add_argument("--heldout", required=True, help="CSV with a text column and optional label column")
+    quantization.add_argument("--model-dir", default="models")
+    quantization.add_argument("--batch-size", type=int, default=32)
+    quantization.add_argument("--latency-sample", type=int, default=512, help="texts used for latency timing")
+    quantization.add_argument("--repeat", type=int, default=3)
+    quantization.set_defaults(func=bench_quantization)
+
+    gates = subparsers.add_parser("gate-table", help="nn.LSTM vs precomputed gate table, per sequence length")
+    gates.add_argument("--model-dir", default="models")
+    gates.add_argument("--lengths", type=int, nargs="+", default=[8, 16, 32, 64, 100])
+    gates.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 32])
+    gates.add_argument("--tolerance", type=float, default=1e-4, help="max allowed logit difference")
+    gates.add_argument("--calls", type=int, default=20)
+    gates.add_argument("--repeat", type=int, default=3)
+    gates.set_defaults(func=bench_gate_table)
+
+    backends = subparsers.add_parser("backends", help="eager vs TorchScript vs torch.export parity and latency")
+    backends.add_argument("--corpus", required=True, help="text file with one review per line")
+    backends.add_argument("--model-dir", default="models")
+    backends.add_argument("--backends", nargs="+", help="backends to compare, eager first (default: all)")
+    backends.add_argument("--batch-size", type=int, default=32)
+    backends.add_argument("--latency-sample", type=int, default=512, help="texts used for latency timing")
+    backends.add_argument("--tolerance", type=float, default=1e-5, help="max allowed probability difference")
+    backends.add_argument("--repeat", type=int, default=3)
+    backends.set_defaults(func=bench_backends)
+
+    startup = subparsers.add_parser("startup", help="app import time budget and model time-to-ready")
+    startup.add_argument("--model-dir", default="models")
+    startup.add_argument("--import-budget-ms", type=float, default=1500)
+    startup.add_argument("--repeat", type=int, default=3)
+    startup.set_defaults(func=bench_startup)
+
+    memory = subparsers.add_parser("memory", help="per-worker memory of uvicorn --workers vs the serve.py prefork launcher")
+    memory.add_argument("--model-dir", default="models")
+    memory.add_argument("--workers", type=int, default=4)
+    memory.add_argument("--port", type=int, default=8799)
+    memory.add_argument("--timeout", type=float, default=120, help="seconds to wait for the workers")
+    memory.set_defaults(func=bench_memory)
+
+    storm = subparsers.add_parser("login-storm", help="/predict latency while a burst of logins runs bcrypt")
+    storm.add_argument("--model-dir", default="models")
+    storm.add_argument("--rounds", type=int, default=BCRYPT_ROUNDS, help="bcrypt cost factor of the test hash")
+    storm.add_argument("--login-rate", type=float, default=20, help="login attempts per second")
+    storm.add_argument("--duration", type=float, default=3, help="seconds per phase")
+    storm.add_argument("--hash-workers", type=int, default=PASSWORD_HASH_WORKERS)
+    storm.add_argument("--max-pending", type=int, default=PASSWORD_HASH_MAX_PENDING)
+    storm.add_argument("--probe-interval-ms", type=float, default=20)
+    storm.add_argument("--p99-budget-ms", type=float, default=25, help="allowed /predict p99 increase with the pool")
+    storm.set_defaults(func=bench_login_storm)
+
+    args = parser.parse_args()
+    sys.exit(0 if args.func(args) else 1)
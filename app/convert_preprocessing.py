@@ -0,0 +1,83 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import pickle
+import numpy as np
+from preprocessing import SequenceTokenizer, LabelDecoder, pad_sequences
+from utils import clean_text
+
+# Converts models/tokenizer.pkl and models/label_encoder.pkl into artifacts
+# that the serving process can load without TensorFlow or scikit-learn:
+#   tokenizer.vocab  compact memory-mapped vocabulary trimmed to num_words (preferred)
+#   tokenizer.json   full word index as JSON
+#   labels.json      label classes
+# Conversion (and --verify) still needs TensorFlow installed to unpickle the originals.
+
+def load_pickles(model_dir):
+    with open(os.path.join(model_dir, "tokenizer.pkl"), "rb") as f:
+        keras_tokenizer = pickle.load(f)
+    with open(os.path.join(model_dir, "label_encoder.pkl"), "rb") as f:
+        label_encoder = pickle.load(f)
+    return keras_tokenizer, label_encoder
+
+def convert(model_dir):
+    keras_tokenizer, label_encoder = load_pickles(model_dir)
+
+    tokenizer = SequenceTokenizer.from_keras(keras_tokenizer)
+    tokenizer.save(os.path.join(model_dir, "tokenizer.json"))
+    tokenizer.save_compact(os.path.join(model_dir, "tokenizer.vocab"))
+
+    labels = LabelDecoder.from_label_encoder(label_encoder)
+    labels.save(os.path.join(model_dir, "labels.json"))
+
+    print(f"Wrote tokenizer.json ({len(tokenizer.word_index)} words), "
+          f"tokenizer.vocab ({len(tokenizer.trimmed_word_index())} words) "
+          f"and labels.json {labels.classes_.tolist()}")
+
+def verify(model_dir, corpus_path, max_len=100):
+    from tensorflow.keras.preprocessing.sequence import pad_sequences as keras_pad_sequences
+
+    keras_tokenizer, label_encoder = load_pickles(model_dir)
+    tokenizers = {
+        "tokenizer.json": SequenceTokenizer.load(os.path.join(model_dir, "tokenizer.json")),
+        "tokenizer.vocab": SequenceTokenizer.load_compact(os.path.join(model_dir, "tokenizer.vocab"))
+    }
+    labels = LabelDecoder.load(os.path.join(model_dir, "labels.json"))
+
+    with open(corpus_path, "r", encoding="utf-8") as f:
+        texts = [clean_text(line.rstrip("\n")) for line in f]
+
+    expected = keras_pad_sequences(
+        keras_tokenizer.texts_to_sequences(texts), maxlen=max_len, padding='post', truncating='post'
+    )
+    for name, tokenizer in tokenizers.items():
+        actual = pad_sequences(
+            tokenizer.texts_to_sequences(texts), maxlen=max_len, padding='post', truncating='post'
+        )
+
+        mismatched = np.flatnonzero((expected != actual).any(axis=1)) if expected.shape == actual.shape else None
+        if expected.dtype != actual.dtype or mismatched is None or len(mismatched):
+            print(f"MISMATCH in {name}: keras {expected.dtype}{expected.shape}, native {actual.dtype}{actual.shape}")
+            if mismatched is not None and len(mismatched):
+                print(f"First differing line: {mismatched[0] + 1} of {len(texts)}")
+            return False
+
+    indices = np.arange(len(label_encoder.classes_))
+    if not np.array_equal(label_encoder.inverse_transform(indices), labels.inverse_transform(indices)):
+        print("MISMATCH: label classes differ")
+        return False
+
+    print(f"OK: {len(texts)} texts produce bit-identical sequences")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert pickled preprocessing artifacts to TensorFlow-free JSON")
+    parser.add_argument("--model-dir", default="models")
+    parser.add_argument("--verify", metavar="CORPUS", help="text file with one review per line to check parity on")
+    args = parser.parse_args()
+
+    if args.verify:
+        sys.exit(0 if verify(args.model_dir, args.verify) else 1)
+    convert(args.model_dir)
@@ -3,7 +3,9 @@ from mysql.connector import Error
 from typing import List, Dict, Any, Optional
 from database import get_db_connection
 from models import UserRole, ReviewResponse
-import json
+from rollups import rollup_rows, upsert_rollups_statement
+from user_cache import user_cache
+from review_columns import RESULT_COLUMNS_SQL, RESULT_SELECT_SQL, REVIEW_PLACEHOLDERS, result_column_values, results_from_row
 
 def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
     connection = get_db_connection()
@@ -22,6 +24,15 @@ def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
         cursor.close()
         connection.close()
 
+def get_cached_user(email: str) -> Optional[Dict[str, Any]]:
+    # id, name, email and role, from the shared TTL cache when possible
+    user = user_cache.get(email)
+    if user is None:
+        user = get_user_by_email(email)
+        if user:
+            user_cache.put(user)
+    return user
+
 def get_all_users() -> List[Dict[str, Any]]:
     connection = get_db_connection()
     if connection is None:
@@ -49,8 +60,8 @@ def get_all_reviews_with_user_info() -> List[Dict[str, Any]]:
     try:
         # Get all reviews with user information
         cursor.execute(
-            """
-            SELECT r.id, r.user_id, r.review_text, r.sentiment_results, r.created_at, 
+            f"""
+            SELECT r.id, r.user_id, r.review_text, r.created_at, {RESULT_SELECT_SQL}, 
                    u.name as user_name, u.email as user_email
             FROM reviews r
             JOIN users u ON r.user_id = u.id
@@ -59,10 +70,10 @@ def get_all_reviews_with_user_info() -> List[Dict[str, Any]]:
         )
         reviews_data = cursor.fetchall()
         
-        # Parse JSON results for each review
+        # Rebuild the results dict of each review from its columns
         reviews = []
         for review_data in reviews_data:
-            review_data['sentiment_results'] = json.loads(review_data['sentiment_results'])
+            review_data['sentiment_results'] = results_from_row(review_data)
             reviews.append(review_data)
         
         return reviews
@@ -84,24 +95,23 @@ def create_review(user_id: int, review_text: str, sentiment_results: Dict[str, A
     cursor = connection.cursor(dictionary=True)
     
     try:
-        results_json = json.dumps(sentiment_results)
-        
         cursor.execute(
-            "INSERT INTO reviews (user_id, review_text, sentiment_results) VALUES (%s, %s, %s)",
-            (user_id, review_text, results_json)
+            f"INSERT INTO reviews (user_id, review_text, {RESULT_COLUMNS_SQL}) VALUES ({REVIEW_PLACEHOLDERS})",
+            (user_id, review_text) + result_column_values(sentiment_results)
         )
-        connection.commit()
         
         review_id = cursor.lastrowid
         cursor.execute(
-            "SELECT * FROM reviews WHERE id = %s",
+            "SELECT id, user_id, created_at FROM reviews WHERE id = %s",
             (review_id,)
         )
         review_data = cursor.fetchone()
         
-        review_data['sentiment_results'] = json.loads(review_data['sentiment_results'])
+        # Update the rollups in the same transaction as the review
+        cursor.execute(*upsert_rollups_statement(rollup_rows(review_data["created_at"], [(user_id, sentiment_results)])))
+        connection.commit()
         
-        return ReviewResponse(**review_data)
+        return ReviewResponse(review_text=review_text, sentiment_results=sentiment_results, **review_data)
     except Error as e:
         print(f"Database error: {e}")
         connection.rollback()
@@ -112,4 +122,46 @@ def create_review(user_id: int, review_text: str, sentiment_results: Dict[str, A
         return None
     finally:
         cursor.close()
-        connection.close()
\ No newline at end of file
+        connection.close()
+
+def create_reviews(user_id: int, review_texts: List[str], sentiment_results: List[Dict[str, Any]]) -> int:
+    if not review_texts:
+        return 0
+    
+    connection = get_db_connection()
+    if connection is None:
+        return 0
+    
+    cursor = connection.cursor()
+    
+    try:
+        # Store every review in a single multi-row INSERT
+        placeholders = ", ".join([f"({REVIEW_PLACEHOLDERS})"] * len(review_texts))
+        params = []
+        for review_text, results in zip(review_texts, sentiment_results):
+            params.extend((user_id, review_text) + result_column_values(results))
+        
+        cursor.execute(
+            f"INSERT INTO reviews (user_id, review_text, {RESULT_COLUMNS_SQL}) VALUES {placeholders}",
+            params
+        )
+        rowcount = cursor.rowcount
+        
+        # Rows of one statement share created_at; update the rollups in the same transaction
+        cursor.execute("SELECT created_at FROM reviews WHERE id = %s", (cursor.lastrowid,))
+        (created_at,) = cursor.fetchone()
+        cursor.execute(*upsert_rollups_statement(rollup_rows(created_at, [(user_id, results) for results in sentiment_results])))
+        connection.commit()
+        
+        return rowcount
+    except Error as e:
+        print(f"Database error: {e}")
+        connection.rollback()
+        return 0
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        connection.rollback()
+        return 0
+    finally:
+        cursor.close()
+        connection.close()
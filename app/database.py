@@ -1,23 +1,274 @@
+import asyncio
 import mysql.connector
 from mysql.connector import Error
 import os
+import threading
+import time
+from collections import deque
 from dotenv import load_dotenv
+from rollups import CREATE_ROLLUPS_TABLE
+from review_columns import SENTIMENT_LABELS
 
 load_dotenv()
 
+# Connection pool settings
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+DB_POOL_RECYCLE_SECONDS = float(os.getenv("DB_POOL_RECYCLE_SECONDS", "3600"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+class PoolTimeoutError(Error):
+    pass
+
+def _connect():
+    return mysql.connector.connect(
+        host=os.getenv("DB_HOST", "localhost"),
+        user=os.getenv("DB_USER", "root"),
+        password=os.getenv("DB_PASSWORD", ""),
+        database=os.getenv("DB_NAME", "payfast_sentiment")
+    )
+
+# Borrowed connection; close() hands it back to the pool instead of disconnecting,
+# everything else is delegated to the underlying mysql-connector connection
+class PooledConnection:
+    def __init__(self, pool, connection, created_at):
+        self._pool = pool
+        self._connection = connection
+        self._created_at = created_at
+
+    def close(self):
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self._pool._release(connection, self._created_at)
+
+    def __getattr__(self, name):
+        if self._connection is None:
+            raise Error("Connection has already been returned to the pool")
+        return getattr(self._connection, name)
+
+# Thread-safe pool of MySQL connections.
+# Keeps up to `size` idle connections, opens up to `max_overflow` extra ones under
+# load (closed again on return), and makes callers wait up to `timeout` seconds
+# when every connection is checked out. Callers on an event loop thread are
+# refused straight away instead: waiting there would stall every request.
+class ConnectionPool:
+    def __init__(self, size=DB_POOL_SIZE, max_overflow=DB_POOL_MAX_OVERFLOW, timeout=DB_POOL_TIMEOUT,
+                 recycle_seconds=DB_POOL_RECYCLE_SECONDS, pre_ping=DB_POOL_PRE_PING, connect=_connect):
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle_seconds = recycle_seconds
+        self.pre_ping = pre_ping
+        self._connect = connect
+        self._idle = deque()
+        self._open = 0
+        self._cond = threading.Condition()
+        self.pid = os.getpid()
+        self.connects = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.ping_failures = 0
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        try:
+            asyncio.get_running_loop()
+            on_event_loop = True
+        except RuntimeError:
+            on_event_loop = False
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    connection, created_at = self._idle.pop()
+                    break
+                if self._open < self.size + self.max_overflow:
+                    self._open += 1
+                    connection = None
+                    break
+
+                if on_event_loop:
+                    self.timeouts += 1
+                    raise PoolTimeoutError("No database connection free, and waiting would block the event loop")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeoutError(f"Timed out after {self.timeout}s waiting for a database connection")
+                self.waits += 1
+                self._cond.wait(remaining)
+
+        # Health checks and connects happen outside the lock
+        if connection is not None and not self._is_usable(connection, created_at):
+            self._close_quietly(connection)
+            connection = None
+
+        if connection is None:
+            try:
+                connection = self._connect()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+            created_at = time.monotonic()
+            with self._cond:
+                self.connects += 1
+
+        return PooledConnection(self, connection, created_at)
+
+    def _is_usable(self, connection, created_at):
+        if self.recycle_seconds > 0 and time.monotonic() - created_at > self.recycle_seconds:
+            return False
+        if not self.pre_ping:
+            return True
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Exception:
+            with self._cond:
+                self.ping_failures += 1
+            return False
+
+    def _release(self, connection, created_at):
+        # End any open transaction so the next borrower does not inherit it
+        # (or a stale REPEATABLE READ snapshot from an earlier SELECT)
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+            reusable = connection.is_connected()
+        except Exception:
+            reusable = False
+
+        with self._cond:
+            if reusable and len(self._idle) < self.size:
+                self._idle.append((connection, created_at))
+                connection = None
+            else:
+                self._open -= 1
+            self._cond.notify()
+
+        if connection is not None:
+            self._close_quietly(connection)
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def stats(self):
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "open": self._open,
+                "idle": idle,
+                "checked_out": self._open - idle,
+                "overflow_in_use": max(self._open - self.size, 0),
+                "connects": self.connects,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "ping_failures": self.ping_failures
+            }
+
+    def dispose(self):
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+        for connection, _ in idle:
+            self._close_quietly(connection)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+    # Connections must not be shared across fork, so each process gets its own pool
+    with _pool_lock:
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = ConnectionPool()
+        return _pool
+
 def get_db_connection():
     try:
-        connection = mysql.connector.connect(
-            host=os.getenv("DB_HOST", "localhost"),
-            user=os.getenv("DB_USER", "root"),
-            password=os.getenv("DB_PASSWORD", ""),
-            database=os.getenv("DB_NAME", "payfast_sentiment")
-        )
-        return connection
+        return get_pool().acquire()
     except Error as e:
         print(f"Error connecting to MySQL: {e}")
         return None
 
+def get_pool_stats():
+    return get_pool().stats()
+
+def _column_extra(cursor, table, column):
+    # information_schema EXTRA of a column (e.g. 'VIRTUAL GENERATED'), or None if it does not exist
+    cursor.execute(
+        "SELECT extra FROM information_schema.columns WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s",
+        (table, column)
+    )
+    row = cursor.fetchone()
+    return None if row is None else (row[0] or "")
+
+def _column_type(cursor, table, column):
+    cursor.execute(
+        "SELECT data_type FROM information_schema.columns WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s",
+        (table, column)
+    )
+    row = cursor.fetchone()
+    return None if row is None else row[0].lower()
+
+def _index_exists(cursor, table, index):
+    cursor.execute(
+        "SELECT 1 FROM information_schema.statistics WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s",
+        (table, index)
+    )
+    return cursor.fetchone() is not None
+
+def ensure_review_columns(cursor):
+    # Typed prediction columns replace the sentiment_results JSON, which is kept
+    # (nullable) only for rows that backfill_review_columns.py has not converted yet
+    extra = _column_extra(cursor, "reviews", "predicted_sentiment")
+    if extra is not None and "GENERATED" in extra.upper():
+        # Earlier schema: a virtual column over the JSON; replace it with a real one
+        if _index_exists(cursor, "reviews", "idx_reviews_sentiment_created_id"):
+            cursor.execute("ALTER TABLE reviews DROP INDEX idx_reviews_sentiment_created_id")
+        cursor.execute("ALTER TABLE reviews DROP COLUMN predicted_sentiment")
+        extra = None
+
+    if extra is None:
+        cursor.execute(
+            "ALTER TABLE reviews MODIFY sentiment_results JSON NULL, "
+            "ADD COLUMN predicted_sentiment VARCHAR(16) NULL, "
+            "ADD COLUMN confidence_negative DOUBLE NULL, "
+            "ADD COLUMN confidence_neutral DOUBLE NULL, "
+            "ADD COLUMN confidence_positive DOUBLE NULL, "
+            "ADD COLUMN model_version VARCHAR(32) NULL"
+        )
+
+    # Earlier schema stored confidences as FLOAT. The rollups sum the doubles the
+    # model returns, so float32 columns made rebuilt and re-scored sums drift.
+    if _column_type(cursor, "reviews", "confidence_negative") == "float":
+        cursor.execute(
+            "ALTER TABLE reviews "
+            + ", ".join(f"MODIFY confidence_{label} DOUBLE NULL" for label in SENTIMENT_LABELS)
+        )
+        print("Confidence columns widened to DOUBLE; run rebuild_rollups.py to align the rollups with them")
+
+def ensure_review_indexes(cursor):
+    # Existing databases predate these, and MySQL has no ADD INDEX IF NOT EXISTS.
+    # Keyset pagination walks (created_at, id), optionally within one sentiment or user
+    indexes = {
+        "idx_reviews_created_id": "(created_at, id)",
+        "idx_reviews_sentiment_created_id": "(predicted_sentiment, created_at, id)",
+        "idx_reviews_user_created_id": "(user_id, created_at, id)",
+    }
+    for index, columns in indexes.items():
+        if not _index_exists(cursor, "reviews", index):
+            cursor.execute(f"ALTER TABLE reviews ADD INDEX {index} {columns}")
+
 def create_tables():
     connection = get_db_connection()
     if connection is None:
@@ -44,7 +295,12 @@ def create_tables():
         id INT AUTO_INCREMENT PRIMARY KEY,
         user_id INT NOT NULL,
         review_text TEXT NOT NULL,
-        sentiment_results JSON NOT NULL,
+        sentiment_results JSON NULL,
+        predicted_sentiment VARCHAR(16) NULL,
+        confidence_negative DOUBLE NULL,
+        confidence_neutral DOUBLE NULL,
+        confidence_positive DOUBLE NULL,
+        model_version VARCHAR(32) NULL,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
     )
@@ -53,6 +309,9 @@ def create_tables():
     try:
         cursor.execute(create_users_table)
         cursor.execute(create_reviews_table)
+        ensure_review_columns(cursor)
+        ensure_review_indexes(cursor)
+        cursor.execute(CREATE_ROLLUPS_TABLE)
         connection.commit()
         print("Tables created successfully")
     except Error as e:
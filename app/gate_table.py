@@ -0,0 +1,57 @@
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from typing import Optional
+
+# Inference-only rewrite of LSTMClassifier with the LSTM input projection folded
+# into a per-token table.
+#
+# An LSTM step computes W_ih @ embedding[token] + b_ih + b_hh for the input half
+# of its gates. With a fixed vocabulary that product only depends on the token,
+# so it is computed once for every token here and each step becomes a row gather
+# plus the recurrent h @ W_hh. The table costs vocab_size x 4 * hidden_dim floats
+# (20 MB for the current model) in exchange for the embedding lookup and the input GEMM.
+class GateTableLSTMClassifier(nn.Module):
+    def __init__(self, model):
+        super(GateTableLSTMClassifier, self).__init__()
+        lstm = model.lstm
+        if lstm.num_layers != 1 or lstm.bidirectional or not lstm.batch_first:
+            raise ValueError("Gate tables need a single-layer, unidirectional, batch-first LSTM")
+
+        with torch.no_grad():
+            gate_table = F.linear(model.embedding.weight, lstm.weight_ih_l0, lstm.bias_ih_l0) + lstm.bias_hh_l0
+            self.register_buffer("gate_table", gate_table.contiguous())
+            self.register_buffer("weight_hh_t", lstm.weight_hh_l0.t().contiguous())
+
+        self.hidden_dim = lstm.hidden_size
+        self.fc1 = model.fc1
+        self.fc2 = model.fc2
+
+    def forward(self, x, lengths: Optional[torch.Tensor] = None):
+        # (batch, steps, 4 * hidden) input gates straight from the table
+        input_gates = F.embedding(x, self.gate_table)
+        batch_size = x.size(0)
+        h = torch.zeros(batch_size, self.hidden_dim, dtype=input_gates.dtype, device=x.device)
+        c = torch.zeros(batch_size, self.hidden_dim, dtype=input_gates.dtype, device=x.device)
+
+        for t in range(x.size(1)):
+            gates = torch.addmm(input_gates[:, t], h, self.weight_hh_t)
+            i, f, g, o = gates.chunk(4, 1)
+            c_next = torch.sigmoid(f) * c + torch.sigmoid(i) * torch.tanh(g)
+            h_next = torch.sigmoid(o) * torch.tanh(c_next)
+
+            if lengths is not None:
+                # Rows past their real length keep their last state, like a packed sequence
+                active = (lengths > t).unsqueeze(1).to(x.device)
+                h = torch.where(active, h_next, h)
+                c = torch.where(active, c_next, c)
+            else:
+                h = h_next
+                c = c_next
+
+        # Dropout layers are identity at inference and are left out
+        return self.fc2(F.relu(self.fc1(h)))
+
+def build_gate_table_model(model):
+    # TorchScript removes the Python overhead of the per-step loop
+    return torch.jit.script(GateTableLSTMClassifier(model).eval())
@@ -0,0 +1,94 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import torch
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# How the loaded LSTMClassifier is executed:
+#   eager        the Python nn.Module as-is (default)
+#   torchscript  traced, frozen and optimized for inference; dropout and the Python
+#                forward are gone from the graph. Works for any batch size and length.
+#   export       torch.export graph with a dynamic batch dimension. nn.LSTM export
+#                specializes on the step count, so inputs must be padded to max_len.
+# Converted graphs are cached under models/compiled, keyed by the weights version,
+# device and torch version, so only the first worker pays for the conversion.
+INFERENCE_BACKENDS = ("eager", "torchscript", "export")
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "eager")
+BACKEND_CACHE_DIR = os.getenv("BACKEND_CACHE_DIR", "")
+
+# Sequence modes (see predict.py) each backend can run
+BACKEND_SEQUENCE_MODES = {
+    "eager": ("padded", "truncate", "packed"),
+    "torchscript": ("padded", "truncate"),
+    "export": ("padded",),
+}
+
+MAX_EXPORT_BATCH = 4096
+
+def backend_cache_path(model_dir, backend, version, device):
+    cache_dir = BACKEND_CACHE_DIR or os.path.join(model_dir, "compiled")
+    torch_version = torch.__version__.replace("+", "_")
+    extension = "pt2" if backend == "export" else "pt"
+    return os.path.join(cache_dir, f"{version}-{backend}-{device.type}-torch{torch_version}.{extension}")
+
+def _example_input(max_len, device):
+    # Two rows so neither dimension is traced as a constant 1
+    return torch.ones((2, max_len), dtype=torch.long, device=device)
+
+def convert_torchscript(model, max_len, device):
+    with torch.no_grad():
+        traced = torch.jit.trace(model, (_example_input(max_len, device),))
+    return torch.jit.optimize_for_inference(torch.jit.freeze(traced.eval()))
+
+def convert_export(model, max_len, device):
+    from torch.export import Dim, export
+    batch = Dim("batch", min=1, max=MAX_EXPORT_BATCH)
+    with torch.no_grad():
+        return export(model, (_example_input(max_len, device),), dynamic_shapes={"x": {0: batch, 1: Dim.STATIC}})
+
+def _save_atomically(save_fn, obj, path):
+    # Workers may start together; write to a private file and rename it into place
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    base, extension = os.path.splitext(path)
+    tmp_path = f"{base}.{os.getpid()}.tmp{extension}"
+    try:
+        save_fn(obj, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def load_backend(model, backend, version, model_dir, max_len, device):
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}'")
+    if backend == "eager":
+        return model
+
+    path = backend_cache_path(model_dir, backend, version, device)
+    if backend == "torchscript":
+        if os.path.exists(path):
+            return torch.jit.load(path, map_location=device)
+        converted = convert_torchscript(model, max_len, device)
+        _save_atomically(torch.jit.save, converted, path)
+        return converted
+
+    if not os.path.exists(path):
+        _save_atomically(torch.export.save, convert_export(model, max_len, device), path)
+    return torch.export.load(path).module()
+
+if __name__ == "__main__":
+    from model_loader import load_model_components
+
+    # Build the cached graphs ahead of time, e.g. during a deploy
+    parser = argparse.ArgumentParser(description="Convert the model for the TorchScript and export backends")
+    parser.add_argument("--model-dir", default="models")
+    parser.add_argument("--backend", choices=INFERENCE_BACKENDS[1:], nargs="+", default=list(INFERENCE_BACKENDS[1:]))
+    args = parser.parse_args()
+
+    for backend in args.backend:
+        model, _, _, device, _ = load_model_components(args.model_dir, backend=backend, sequence_mode="padded")
+        print(f"{backend}: ready, version {model.version}")
@@ -0,0 +1,116 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import torch
+from dotenv import load_dotenv
+from predict import predict_sentiments
+from prediction_cache import PredictionCache
+
+load_dotenv()
+
+# Inference pool settings
+INFERENCE_POOL_MODE = os.getenv("INFERENCE_POOL_MODE", "thread")  # thread or process
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+INFERENCE_TORCH_THREADS = int(os.getenv("INFERENCE_TORCH_THREADS", "0"))  # 0 keeps the torch default
+
+# Per-process state of process-mode workers
+_worker_components = None
+_worker_cache = None
+
+def _init_process_worker(model_dir, torch_threads):
+    global _worker_components, _worker_cache
+    from model_loader import load_model_components
+
+    if torch_threads > 0:
+        torch.set_num_threads(torch_threads)
+    _worker_components = load_model_components(model_dir)
+    _worker_cache = PredictionCache()
+
+def _predict_in_process_worker(texts):
+    return predict_sentiments(texts, *_worker_components, _worker_cache)
+
+# Runs CPU-bound inference off the event loop.
+# thread mode shares the caller's model and cache; torch releases the GIL during
+# the forward pass, so tokenization of one batch overlaps the math of another.
+# process mode gives every child its own model, loaded once by the initializer.
+class InferencePool:
+    def __init__(self, mode=INFERENCE_POOL_MODE, workers=INFERENCE_WORKERS,
+                 torch_threads=INFERENCE_TORCH_THREADS, model_dir="models"):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown inference pool mode '{mode}'")
+        self.mode = mode
+        self.workers = max(workers, 1)
+        self.torch_threads = torch_threads
+        self.model_dir = model_dir
+        self.components = None
+        self.cache = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.completed = 0
+        self.failed = 0
+
+    def start(self, components=None, cache=None):
+        if self.mode == "thread":
+            if components is None:
+                raise ValueError("Thread mode needs loaded model components")
+            if self.torch_threads > 0:
+                torch.set_num_threads(self.torch_threads)
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        else:
+            # Spawn rather than fork: forking after torch has started its
+            # thread pools can deadlock the children
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_process_worker,
+                initargs=(self.model_dir, self.torch_threads)
+            )
+        self.components = components
+        self.cache = cache
+
+    async def predict(self, texts):
+        if self._executor is None:
+            raise RuntimeError("Inference pool is not started")
+
+        if self.mode == "thread":
+            call = (predict_sentiments, texts, *self.components, self.cache)
+        else:
+            call = (_predict_in_process_worker, texts)
+
+        with self._lock:
+            self._pending += 1
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(self._executor, *call)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+        with self._lock:
+            self.completed += 1
+        return results
+
+    def stats(self):
+        with self._lock:
+            pending = self._pending
+        in_flight = min(pending, self.workers)
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "torch_threads": torch.get_num_threads() if self.mode == "thread" else self.torch_threads,
+            "in_flight": in_flight,
+            "queue_depth": pending - in_flight,
+            "completed": self.completed,
+            "failed": self.failed
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
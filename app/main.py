@@ -4,9 +4,12 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse, RedirectResponse
 from starlette.middleware.sessions import SessionMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware    
-from database import create_tables
-from routes import router
+from database import create_tables, get_pool
+from async_database import init_async_pool, close_async_pool
+from routes import router, model_manager, review_writer, password_pool
+from model_manager import MODEL_LOAD_ON_STARTUP
 from admin_routes import router as admin_router
+import asyncio
 import os
 from dotenv import load_dotenv
 
@@ -25,10 +28,35 @@ app.add_middleware(
     same_site="lax"
 )
 
-# Initialize database tables on startup
+# Initialize database tables on startup, off the event loop: the sync pool
+# and the connect block
 @app.on_event("startup")
-def startup_event():
-    create_tables()
+async def startup_event():
+    await asyncio.get_running_loop().run_in_executor(None, create_tables)
+
+@app.on_event("startup")
+async def async_startup_event():
+    # Requests retry the pool lazily if the database is not reachable yet
+    try:
+        await init_async_pool()
+    except Exception as e:
+        print(f"Error creating async MySQL pool: {e}")
+
+@app.on_event("startup")
+async def model_startup_event():
+    # Loads in the background; /health/ready reports when it is done.
+    # With MODEL_LOAD_ON_STARTUP=false the first prediction triggers the load.
+    if MODEL_LOAD_ON_STARTUP:
+        model_manager.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await model_manager.stop()
+    # Write queued reviews before the database pools close
+    await review_writer.stop()
+    password_pool.shutdown()
+    get_pool().dispose()
+    await close_async_pool()
 
 # Include routes from the routes module
 app.include_router(router)
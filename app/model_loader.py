@@ -1,35 +1,165 @@
 import torch
+import torch.nn as nn
+import hashlib
+import os
 import pickle
+from dotenv import load_dotenv
 from utils import LSTMClassifier
+from gate_table import build_gate_table_model
+from inference_backends import INFERENCE_BACKEND, BACKEND_SEQUENCE_MODES, load_backend
+from predict import SEQUENCE_MODE
+from preprocessing import SequenceTokenizer, LabelDecoder
+from review_columns import SENTIMENT_LABELS
 
-def load_model_components():
-    # Load tokenizer and label encoder
-    with open("models/tokenizer.pkl", "rb") as f:
+load_dotenv()
+
+# none keeps fp32 weights; dynamic_int8 quantizes the LSTM and Linear layers for CPU serving
+MODEL_QUANTIZATION = os.getenv("MODEL_QUANTIZATION", "none")
+WEIGHTS_FILE = "lstm_sentiment_model.pth"
+QUANTIZED_WEIGHTS_FILE = "lstm_sentiment_model.int8.pth"
+# Version of the fp32 weights the int8 artifact was converted from
+QUANTIZED_SOURCE_FILE = "lstm_sentiment_model.int8.source"
+
+# Map the fp32 weights file instead of reading it into private memory, so processes
+# serving the same file share its pages through the page cache (CPU only)
+MODEL_MMAP = os.getenv("MODEL_MMAP", "true").lower() in ("1", "true", "yes")
+
+# Serve through the precomputed embedding-to-gate table (see gate_table.py)
+MODEL_GATE_TABLE = os.getenv("MODEL_GATE_TABLE", "false").lower() in ("1", "true", "yes")
+
+def load_preprocessors(model_dir="models"):
+    vocab_path = os.path.join(model_dir, "tokenizer.vocab")
+    tokenizer_path = os.path.join(model_dir, "tokenizer.json")
+    labels_path = os.path.join(model_dir, "labels.json")
+
+    # Prefer the converted artifacts, which load without TensorFlow or scikit-learn.
+    # The compact vocabulary is memory-mapped, so workers share it through the page cache.
+    if os.path.exists(labels_path):
+        if os.path.exists(vocab_path):
+            return SequenceTokenizer.load_compact(vocab_path), LabelDecoder.load(labels_path)
+        if os.path.exists(tokenizer_path):
+            return SequenceTokenizer.load(tokenizer_path), LabelDecoder.load(labels_path)
+
+    print("Converted tokenizer not found, falling back to pickles (run convert_preprocessing.py)")
+    with open(os.path.join(model_dir, "tokenizer.pkl"), "rb") as f:
         tokenizer = pickle.load(f)
-    
-    with open("models/label_encoder.pkl", "rb") as f:
+
+    with open(os.path.join(model_dir, "label_encoder.pkl"), "rb") as f:
         label_encoder = pickle.load(f)
-    
+
+    return tokenizer, label_encoder
+
+def compute_model_version(weights_path):
+    # Content hash of the weights, so replaced weights always get a new version
+    digest = hashlib.sha256()
+    with open(weights_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+def quantized_source_version(model_dir):
+    try:
+        with open(os.path.join(model_dir, QUANTIZED_SOURCE_FILE)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+def build_model(max_len=100):
     # Model parameters
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     embedding_dim = 128
     hidden_dim = 128
     output_dim = 3
     vocab_size = 10000
-    max_len = 100
-    
-    # Initialize model
-    model = LSTMClassifier(
+
+    return LSTMClassifier(
         vocab_size=vocab_size,
         embedding_dim=embedding_dim,
         hidden_dim=hidden_dim,
         output_dim=output_dim,
         max_len=max_len
     )
-    
-    # Load saved weights
-    model.load_state_dict(torch.load("models/lstm_sentiment_model.pth", map_location=device))
+
+def quantize_model(model):
+    # Weights are stored as int8 and activations quantized on the fly, which
+    # needs no calibration data; the embedding table stays fp32
+    return torch.ao.quantization.quantize_dynamic(model, {nn.LSTM, nn.Linear}, dtype=torch.qint8)
+
+def load_model_components(model_dir="models", quantization=MODEL_QUANTIZATION, gate_table=MODEL_GATE_TABLE,
+                          backend=INFERENCE_BACKEND, sequence_mode=SEQUENCE_MODE):
+    if backend != "eager" and (quantization != "none" or gate_table):
+        raise ValueError(f"The {backend} backend converts the fp32 model and cannot be combined with "
+                         f"quantization or gate tables")
+    if backend in BACKEND_SEQUENCE_MODES and sequence_mode not in BACKEND_SEQUENCE_MODES[backend]:
+        raise ValueError(f"The {backend} backend does not support the '{sequence_mode}' sequence mode")
+
+    # Load tokenizer and label encoder
+    tokenizer, label_encoder = load_preprocessors(model_dir)
+
+    # Each label has its own confidence column and rollup rows; a model with other
+    # labels would store predictions those columns cannot hold
+    labels = sorted(str(label) for label in label_encoder.classes_)
+    if labels != sorted(SENTIMENT_LABELS):
+        raise ValueError(f"Model in {model_dir} predicts labels {labels}, but the review columns "
+                         f"are for {list(SENTIMENT_LABELS)} (review_columns.SENTIMENT_LABELS)")
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    max_len = 100
+
+    # Initialize model
+    model = build_model(max_len)
+    weights_path = os.path.join(model_dir, WEIGHTS_FILE)
+
+    if quantization == "dynamic_int8":
+        if gate_table:
+            raise ValueError("Gate tables need fp32 LSTM weights and cannot be combined with quantization")
+
+        # Quantized kernels are CPU-only
+        device = torch.device("cpu")
+        quantized_path = os.path.join(model_dir, QUANTIZED_WEIGHTS_FILE)
+
+        # An artifact left over from earlier weights would be served under a valid-looking version
+        fresh = os.path.exists(quantized_path) and quantized_source_version(model_dir) == compute_model_version(weights_path)
+        if os.path.exists(quantized_path) and not fresh:
+            print(f"{quantized_path} was not converted from the current {WEIGHTS_FILE}; "
+                  f"quantizing in memory instead (rerun quantize_model.py)")
+
+        if fresh:
+            # Pre-converted artifact (see quantize_model.py): quantize the untrained
+            # module for its structure, then load the int8 weights into it
+            model = quantize_model(model.eval())
+            model.load_state_dict(torch.load(quantized_path, map_location=device, weights_only=False))
+            version = compute_model_version(quantized_path)
+        else:
+            model.load_state_dict(torch.load(weights_path, map_location=device))
+            model = quantize_model(model.eval())
+            version = compute_model_version(weights_path)
+        model.eval()
+        model.version = f"{version}-int8"
+
+        return model, tokenizer, label_encoder, device, max_len
+
+    if quantization != "none":
+        raise ValueError(f"Unknown model quantization '{quantization}'")
+
+    # Load saved weights. With mmap, assign makes the parameters use the mapped
+    # tensors directly rather than copying them into freshly allocated ones.
+    if MODEL_MMAP and device.type == "cpu":
+        state_dict = torch.load(weights_path, map_location=device, mmap=True, weights_only=True)
+        model.load_state_dict(state_dict, assign=True)
+    else:
+        model.load_state_dict(torch.load(weights_path, map_location=device))
     model = model.to(device)
     model.eval()
-    
-    return model, tokenizer, label_encoder, device, max_len
\ No newline at end of file
+
+    # Prediction caches key on this, so results never outlive the weights they came from
+    version = compute_model_version(weights_path)
+
+    if gate_table:
+        model = build_gate_table_model(model)
+        version = f"{version}-gates"
+    elif backend != "eager":
+        model = load_backend(model, backend, version, model_dir, max_len, device)
+        version = f"{version}-{backend}"
+    model.version = version
+
+    return model, tokenizer, label_encoder, device, max_len
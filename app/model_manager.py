@@ -0,0 +1,519 @@
+import asyncio
+import fcntl
+import json
+import os
+import random
+import time
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from batching import MicroBatcher
+
+load_dotenv()
+
+# Model lifecycle settings
+MODEL_DIR = os.getenv("MODEL_DIR", "models")
+MODEL_LOAD_ON_STARTUP = os.getenv("MODEL_LOAD_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+MODEL_READY_TIMEOUT_SECONDS = float(os.getenv("MODEL_READY_TIMEOUT_SECONDS", "30"))
+# After a failed load, the next request retries once this delay has passed; it
+# doubles with every further failure, up to the maximum
+MODEL_LOAD_RETRY_SECONDS = float(os.getenv("MODEL_LOAD_RETRY_SECONDS", "5"))
+MODEL_LOAD_RETRY_MAX_SECONDS = float(os.getenv("MODEL_LOAD_RETRY_MAX_SECONDS", "300"))
+
+# Hot reload. MODEL_REGISTRY_DIR holds one subdirectory per model version, laid
+# out like MODEL_DIR. A version is published by copying its files in and then
+# creating an empty READY file. registry.json next to them records the active
+# version and the canary; every worker polls it, so a change made through the
+# admin API on one worker reaches the others within the poll interval.
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "")
+MODEL_REGISTRY_POLL_SECONDS = float(os.getenv("MODEL_REGISTRY_POLL_SECONDS", "10"))
+MODEL_KEEP_VERSIONS = int(os.getenv("MODEL_KEEP_VERSIONS", "2"))  # loaded for instant rollback, canary not included
+MODEL_CANARY_PERCENT = float(os.getenv("MODEL_CANARY_PERCENT", "0"))  # 0 activates new versions straight away
+REGISTRY_READY_FILE = "READY"
+REGISTRY_STATE_FILE = "registry.json"
+
+# Name of the version in MODEL_DIR, which serves until the registry has one
+DEFAULT_VERSION = "default"
+
+# Texts of different lengths, so every sequence bucket runs once before real traffic
+WARMUP_TEXTS = [
+    "good",
+    "the payment went through quickly and support was helpful",
+    " ".join(["the app keeps failing when I try to pay my bills"] * 12),
+]
+
+class ModelNotReadyError(Exception):
+    pass
+
+def registry_versions(registry_dir=MODEL_REGISTRY_DIR):
+    # Published versions, oldest first; name them so they sort by age (e.g. dates)
+    if not registry_dir or not os.path.isdir(registry_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(registry_dir)
+        if os.path.isfile(os.path.join(registry_dir, name, REGISTRY_READY_FILE))
+    )
+
+def read_registry_state(registry_dir=MODEL_REGISTRY_DIR):
+    # {"active", "canary", "canary_percent", "last_good", "published"}; empty until first written
+    try:
+        with open(os.path.join(registry_dir, REGISTRY_STATE_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+@contextmanager
+def registry_lock(registry_dir=MODEL_REGISTRY_DIR):
+    # Every worker reads, changes and writes registry.json; an exclusive flock on
+    # the registry directory keeps one worker from overwriting another's change.
+    # Held only around the file access, never across a model load.
+    fd = os.open(registry_dir, os.O_RDONLY)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+def write_registry_state(state, registry_dir=MODEL_REGISTRY_DIR):
+    path = os.path.join(registry_dir, REGISTRY_STATE_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+def version_dir(name):
+    return MODEL_DIR if name == DEFAULT_VERSION else os.path.join(MODEL_REGISTRY_DIR, name)
+
+def initial_versions():
+    # Versions to try at startup, in order: the registry's active version, the
+    # last one that went live, the newest published one, then MODEL_DIR
+    if not MODEL_REGISTRY_DIR:
+        return [DEFAULT_VERSION]
+    versions = registry_versions()
+    state = read_registry_state()
+    candidates = []
+    for name in (state.get("active"), state.get("last_good"), versions[-1] if versions else None, DEFAULT_VERSION):
+        if name and (name == DEFAULT_VERSION or name in versions) and name not in candidates:
+            candidates.append(name)
+    return candidates
+
+def initial_version():
+    return initial_versions()[0]
+
+# Components loaded by a prefork master (see serve.py) before it forks the
+# workers; each worker's manager serves them instead of loading its own copy.
+# Versions loaded later by hot reload are private to each worker.
+_preloaded_components = None
+_preloaded_dir = None
+
+def preload_model(model_dir=None):
+    global _preloaded_components, _preloaded_dir
+    from model_loader import load_model_components
+    candidates = [model_dir] if model_dir else [version_dir(name) for name in initial_versions()]
+    for i, candidate in enumerate(candidates):
+        try:
+            components = load_model_components(candidate)
+        except Exception as e:
+            if i == len(candidates) - 1:
+                raise
+            print(f"Error preloading {candidate}: {e}; trying the next version")
+            continue
+        _preloaded_dir, _preloaded_components = candidate, components
+        return components
+
+# One model version with its own inference pool and batcher. in_flight counts
+# the requests routed to it, so it is only shut down once they have finished.
+class LoadedModel:
+    def __init__(self, name, model_dir):
+        self.name = name
+        self.model_dir = model_dir
+        self.state = "loading"
+        self.error = None
+        self.model_version = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.inference_pool = None
+        self.batcher = None
+        self.in_flight = 0
+
+    def status(self):
+        return {
+            "name": self.name,
+            "status": self.state,
+            "model_version": self.model_version,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "in_flight": self.in_flight,
+            "error": self.error
+        }
+
+    async def stop(self):
+        if self.batcher is not None:
+            await self.batcher.stop()
+        if self.inference_pool is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.inference_pool.shutdown)
+        self.state = "stopped"
+
+# Owns the loaded model versions, the shared prediction cache and the routing
+# between them. Nothing heavy is imported until load starts, so importing the
+# routes (for the admin pages, scripts or tests) does not pull in torch or read
+# the weights. The first load goes not_loaded -> loading -> warming -> ready, or
+# failed at any step. Later versions load and warm up in the background while
+# the active one keeps serving; the switch is a reference swap on the event
+# loop, so every request runs entirely on the version it started on.
+class ModelManager:
+    def __init__(self, model_dir=None):
+        self.model_dir = model_dir
+        self.state = "not_loaded"
+        self.error = None
+        self.prediction_cache = None
+        self.versions = {}
+        self.active = None
+        self.canary = None
+        self.canary_percent = 0.0
+        self.history = []
+        self.failed = {}
+        self._load_task = None
+        self._load_failures = 0
+        self._retry_at = 0.0
+        self._poll_task = None
+        self._reload_lock = None
+
+    @property
+    def registry_enabled(self):
+        # An explicit model_dir (benchmarks, scripts) pins that one directory
+        return bool(MODEL_REGISTRY_DIR) and self.model_dir is None
+
+    def start(self):
+        # Begin loading in the background; safe to call more than once. A failed
+        # load is retried by the first call after the retry delay.
+        if self._load_task is None or (self.state == "failed" and time.monotonic() >= self._retry_at):
+            if self._reload_lock is None:
+                self._reload_lock = asyncio.Lock()
+            self._load_task = asyncio.get_running_loop().create_task(self._load())
+        return self._load_task
+
+    def _load_blocking(self, version):
+        from inference_pool import InferencePool
+        from prediction_cache import PredictionCache
+
+        inference_pool = InferencePool(model_dir=version.model_dir)
+        components = None
+        if inference_pool.mode == "thread":
+            if self.prediction_cache is None:
+                # Shared by all versions; entries are keyed by model version.
+                # Process-mode children each keep their own instead.
+                self.prediction_cache = PredictionCache()
+            if _preloaded_components is not None and version.model_dir == _preloaded_dir:
+                components = _preloaded_components
+            else:
+                from model_loader import load_model_components
+                components = load_model_components(version.model_dir)
+            version.model_version = components[0].version
+        # Process-mode children load their own copy, so the server process never needs one
+        inference_pool.start(components, self.prediction_cache)
+        return inference_pool
+
+    async def _load_version(self, name):
+        version = LoadedModel(name, self.model_dir or version_dir(name))
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            version.inference_pool = await loop.run_in_executor(None, self._load_blocking, version)
+            version.load_seconds = time.perf_counter() - start
+
+            # One forward pass per worker, so first requests do not pay for
+            # lazy allocations and kernel selection
+            version.state = "warming"
+            start = time.perf_counter()
+            results = await asyncio.gather(*(version.inference_pool.predict(WARMUP_TEXTS)
+                                             for _ in range(version.inference_pool.workers)))
+            version.warmup_seconds = time.perf_counter() - start
+            version.model_version = results[0][0]["model_version"]
+
+            version.batcher = MicroBatcher(version.inference_pool.predict,
+                                           max_concurrent_batches=version.inference_pool.workers)
+            version.state = "ready"
+            print(f"Model {name} ({version.model_version}) ready "
+                  f"(load {version.load_seconds:.2f}s, warm-up {version.warmup_seconds:.2f}s)")
+            return version
+        except Exception as e:
+            version.state = "failed"
+            version.error = str(e)
+            print(f"Error loading model {name}: {e}")
+            await version.stop()
+            return version
+
+    async def _load(self):
+        self.state = "loading"
+        for name in initial_versions() if self.registry_enabled else [DEFAULT_VERSION]:
+            version = await self._load_version(name)
+            if version.state == "ready":
+                break
+            self.failed[name] = version.error
+        if version.state != "ready":
+            self._load_failures += 1
+            delay = min(MODEL_LOAD_RETRY_SECONDS * 2 ** (self._load_failures - 1), MODEL_LOAD_RETRY_MAX_SECONDS)
+            self._retry_at = time.monotonic() + delay
+            self.state = "failed"
+            self.error = version.error
+            print(f"Model load failed {self._load_failures} time(s), retrying after {delay:g}s")
+            return
+        self._load_failures = 0
+        self.error = None
+
+        self.versions[version.name] = version
+        self.active = version
+        self.history.append(version.name)
+        self.state = "ready"
+
+        if self.registry_enabled and MODEL_REGISTRY_POLL_SECONDS > 0:
+            self._poll_task = asyncio.get_running_loop().create_task(self._poll_registry())
+
+    async def _poll_registry(self):
+        while True:
+            try:
+                await self.reconcile()
+            except Exception as e:
+                print(f"Error reading the model registry: {e}")
+            await asyncio.sleep(MODEL_REGISTRY_POLL_SECONDS)
+
+    def _publish_new_versions(self, state):
+        # Versions published since the last poll (by any worker) become the
+        # canary, or go live directly when canaries are off
+        versions = registry_versions()
+        if "published" not in state:
+            # First run against this registry: what is there already counts as published
+            state.update({"active": self.active.name, "canary": None, "canary_percent": 0.0, "published": versions})
+            return True
+
+        new_versions = [name for name in versions if name not in state["published"]]
+        if not new_versions:
+            return False
+        newest = new_versions[-1]
+        if MODEL_CANARY_PERCENT > 0:
+            state.update({"canary": newest, "canary_percent": MODEL_CANARY_PERCENT})
+        else:
+            state.update({"active": newest, "canary": None, "canary_percent": 0.0})
+        state["published"] = state["published"] + new_versions
+        return True
+
+    async def reconcile(self):
+        # Brings the loaded versions in line with registry.json
+        if not self.registry_enabled or self.active is None:
+            return
+        async with self._reload_lock:
+            # Load what the registry names first, without holding the file lock
+            planned = read_registry_state()
+            self._publish_new_versions(planned)
+            for name in (planned.get("active"), planned.get("canary")):
+                await self._ensure_loaded(name)
+
+            # Another worker may have changed registry.json during the load (an
+            # admin activation, a rollback), so decide on a fresh copy. Nothing is
+            # written that names a version this worker has not loaded.
+            with registry_lock():
+                state = read_registry_state()
+                published = set(state.get("published") or [])
+                changed = self._publish_new_versions(state)
+                for name in state["published"]:
+                    if published and name not in published:
+                        print(f"Model version {name} published")
+
+                # A version that does not load is taken back out of the registry
+                # state, so other workers and restarts stop trying it
+                active_name, canary_name = state.get("active"), state.get("canary")
+                if active_name in self.failed and active_name != self.active.name:
+                    print(f"Model version {active_name} did not load; keeping {self.active.name} active")
+                    state["active"] = active_name = self.active.name
+                    changed = True
+                if canary_name and canary_name in self.failed and canary_name != active_name:
+                    print(f"Model version {canary_name} did not load; ending the canary")
+                    state.update({"canary": None, "canary_percent": 0.0})
+                    canary_name = None
+                    changed = True
+
+                # Swap between requests: new requests see the new references,
+                # requests already running finish on the version they started on.
+                # A version named since the load above is picked up by the next poll.
+                active = self.versions.get(active_name)
+                if active is not None and active is not self.active:
+                    print(f"Model version {active.name} is now active (was {self.active.name})")
+                    self.active = active
+                    if active.name in self.history:
+                        self.history.remove(active.name)
+                    self.history.append(active.name)
+                canary = self.versions.get(canary_name) if canary_name and canary_name != active_name else None
+                self.canary = canary
+                self.canary_percent = float(state.get("canary_percent") or 0.0) if canary is not None else 0.0
+
+                # Where restarts fall back to if the active version stops loading
+                if active is self.active and state.get("last_good") != self.active.name:
+                    state["last_good"] = self.active.name
+                    changed = True
+                if changed:
+                    write_registry_state(state)
+
+            await self._evict()
+
+    async def _ensure_loaded(self, name):
+        if not name:
+            return None
+        version = self.versions.get(name)
+        if version is not None:
+            return version
+        if name in self.failed:
+            # Not retried until an admin asks for it again
+            return None
+        if name != DEFAULT_VERSION and name not in registry_versions():
+            self.failed[name] = "Not published in the model registry"
+            print(f"Model version {name} is not published in {MODEL_REGISTRY_DIR}")
+            return None
+
+        version = await self._load_version(name)
+        if version.state != "ready":
+            self.failed[name] = version.error
+            return None
+        self.versions[name] = version
+        return version
+
+    async def _evict(self):
+        # Keep the active version, the canary and the most recently active
+        # others, up to MODEL_KEEP_VERSIONS besides the canary
+        keep = {self.active.name}
+        for name in reversed(self.history):
+            if len(keep) >= max(MODEL_KEEP_VERSIONS, 1):
+                break
+            if name in self.versions:
+                keep.add(name)
+        if self.canary is not None:
+            keep.add(self.canary.name)
+
+        for name in [name for name in self.versions if name not in keep]:
+            version = self.versions.pop(name)
+            self.history = [entry for entry in self.history if entry != name]
+            asyncio.get_running_loop().create_task(self._retire(version))
+
+    async def _retire(self, version):
+        while version.in_flight:
+            await asyncio.sleep(0.05)
+        await version.stop()
+        print(f"Model version {version.name} unloaded")
+
+    async def update_registry(self, **changes):
+        # Admin changes go through registry.json so every worker follows them
+        if not self.registry_enabled:
+            raise ValueError("Model registry is not configured (MODEL_REGISTRY_DIR)")
+        await self.wait_ready()
+        for name in (changes.get("active"), changes.get("canary")):
+            if name and name != DEFAULT_VERSION and name not in registry_versions():
+                raise ValueError(f"Model version {name} is not published")
+            # An explicit request retries a version that failed before
+            self.failed.pop(name, None)
+
+        async with self._reload_lock:
+            # Load and warm up first; registry.json only ever names versions that loaded
+            to_load = [changes.get("active")]
+            if changes.get("canary_percent"):
+                to_load.append(changes.get("canary"))
+            for name in to_load:
+                if name and await self._ensure_loaded(name) is None:
+                    raise ValueError(f"Model version {name} failed to load, registry unchanged: {self.failed[name]}")
+
+            with registry_lock():
+                state = read_registry_state()
+                self._publish_new_versions(state)
+                state.update(changes)
+                if state.get("canary") in (None, state.get("active")) or not state.get("canary_percent"):
+                    state.update({"canary": None, "canary_percent": 0.0})
+                write_registry_state(state)
+        await self.reconcile()
+        return self.registry_status()
+
+    async def rollback(self):
+        # Back to the most recent other version that is still loaded
+        previous = [name for name in self.history[:-1] if name in self.versions]
+        if not previous:
+            raise ValueError("No previous version is loaded")
+        return await self.update_registry(active=previous[-1])
+
+    async def wait_ready(self, timeout=MODEL_READY_TIMEOUT_SECONDS):
+        # Lazy mode loads on the first request that needs the model
+        task = self.start()
+        if self.state != "ready":
+            try:
+                await asyncio.wait_for(asyncio.shield(task), timeout)
+            except asyncio.TimeoutError:
+                raise ModelNotReadyError(f"Model is still {self.state}")
+        if self.state != "ready":
+            raise ModelNotReadyError(f"Model failed to load: {self.error}")
+
+    def _route(self):
+        canary = self.canary
+        if canary is not None and random.random() * 100 < self.canary_percent:
+            return canary
+        return self.active
+
+    async def submit(self, text):
+        await self.wait_ready()
+        version = self._route()
+        version.in_flight += 1
+        try:
+            return await version.batcher.submit(text)
+        finally:
+            version.in_flight -= 1
+
+    async def predict(self, texts):
+        await self.wait_ready()
+        version = self._route()
+        version.in_flight += 1
+        try:
+            return await version.batcher.run_batch(texts)
+        finally:
+            version.in_flight -= 1
+
+    def status(self):
+        active = self.active
+        return {
+            "status": self.state,
+            "model_version": active.model_version if active else None,
+            "active_version": active.name if active else None,
+            "canary_version": self.canary.name if self.canary else None,
+            "canary_percent": self.canary_percent,
+            "load_seconds": active.load_seconds if active else None,
+            "warmup_seconds": active.warmup_seconds if active else None,
+            "error": self.error
+        }
+
+    def registry_status(self):
+        return {
+            **self.status(),
+            "registry_dir": MODEL_REGISTRY_DIR if self.registry_enabled else None,
+            "published": registry_versions() if self.registry_enabled else [],
+            "loaded": [version.status() for version in self.versions.values()],
+            "history": list(self.history),
+            "failed": dict(self.failed)
+        }
+
+    def stats(self):
+        active = self.active
+        return {
+            "model": self.status(),
+            # None in process mode, where every inference process has its own cache
+            "prediction_cache": self.prediction_cache.stats() if self.prediction_cache else None,
+            "batcher": active.batcher.stats() if active else None,
+            "inference_pool": active.inference_pool.stats() if active else None
+        }
+
+    async def stop(self):
+        if self._load_task is not None and not self._load_task.done():
+            await asyncio.wait([self._load_task])
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            try:
+                await self._poll_task
+            except asyncio.CancelledError:
+                pass
+            self._poll_task = None
+        for version in list(self.versions.values()):
+            await version.stop()
+        self.versions = {}
@@ -1,41 +1,119 @@
+import os
 import torch
-import pandas as pd
 import numpy as np
-from tensorflow.keras.preprocessing.sequence import pad_sequences
-from utils import clean_text
-
-def predict_sentiment(text, model, tokenizer, label_encoder, device, max_len=100):
-    cleaned = clean_text(text)
-    
-    # Tokenize and pad
-    seq = tokenizer.texts_to_sequences([cleaned])
-    padded = pad_sequences(seq, maxlen=max_len, padding='post', truncating='post')
-    
-    # Convert to tensor
-    input_tensor = torch.tensor(padded, dtype=torch.long).to(device)
-    
-    # Predict
-    model.eval()
+from dotenv import load_dotenv
+from preprocessing import pad_sequences
+from utils import clean_texts
+
+load_dotenv()
+
+# How padded batches are fed to the LSTM:
+#   padded    always run max_len steps, exactly as the model was trained (default)
+#   truncate  group rows into length buckets and cut each bucket to its longest row
+#   packed    pack every row to its real length, so no padding steps run at all
+# truncate and packed change outputs for short texts; compare them with
+# `benchmark.py sequence-modes` before switching.
+SEQUENCE_MODES = ("padded", "truncate", "packed")
+SEQUENCE_MODE = os.getenv("SEQUENCE_MODE", "padded")
+SEQUENCE_BUCKETS = tuple(int(b) for b in os.getenv("SEQUENCE_BUCKETS", "8,16,32,64").split(","))
+
+def encode_texts(texts, tokenizer, max_len=100):
+    cleaned = clean_texts(texts)
+
+    # Tokenize and pad the whole batch at once
+    seqs = tokenizer.texts_to_sequences(cleaned)
+    return pad_sequences(seqs, maxlen=max_len, padding='post', truncating='post')
+
+def _length_buckets(lengths, max_len):
+    # Smallest bucket boundary that fits each row; rows longer than every
+    # boundary share the last bucket, which is cut to max_len
+    boundaries = np.array(sorted(b for b in SEQUENCE_BUCKETS if b < max_len) + [max_len])
+    bucket_ids = np.searchsorted(boundaries, lengths)
+    for bucket_id in np.unique(bucket_ids):
+        rows = np.flatnonzero(bucket_ids == bucket_id)
+        yield rows, int(lengths[rows].max())
+
+def forward_probabilities(model, padded, device, sequence_mode=SEQUENCE_MODE):
+    if sequence_mode not in SEQUENCE_MODES:
+        raise ValueError(f"Unknown sequence mode '{sequence_mode}'")
+
+    # Post-padding with id 0, so the real length is the count of non-zero ids.
+    # Empty texts still get one (padding) step so the LSTM has an output.
+    lengths = np.maximum((padded != 0).sum(axis=1), 1)
+
     with torch.no_grad():
-        outputs = model(input_tensor)
-        probs = torch.softmax(outputs, dim=1)
-        pred_idx = torch.argmax(probs, dim=1).item()
-    
+        if sequence_mode == "padded":
+            outputs = model(torch.tensor(padded, dtype=torch.long).to(device))
+            return torch.softmax(outputs, dim=1).cpu().numpy()
+
+        if sequence_mode == "packed":
+            input_tensor = torch.tensor(padded[:, :lengths.max()], dtype=torch.long).to(device)
+            outputs = model(input_tensor, torch.tensor(lengths, dtype=torch.long))
+            return torch.softmax(outputs, dim=1).cpu().numpy()
+
+        probs = None
+        for rows, bucket_len in _length_buckets(lengths, padded.shape[1]):
+            input_tensor = torch.tensor(padded[rows, :bucket_len], dtype=torch.long).to(device)
+            bucket_probs = torch.softmax(model(input_tensor), dim=1).cpu().numpy()
+            if probs is None:
+                probs = np.empty((len(padded), bucket_probs.shape[1]), dtype=bucket_probs.dtype)
+            probs[rows] = bucket_probs
+        return probs
+
+def predict_sentiments(texts, model, tokenizer, label_encoder, device, max_len=100, cache=None,
+                       sequence_mode=SEQUENCE_MODE):
+    padded = encode_texts(texts, tokenizer, max_len)
+
+    # Texts that pad to the same token ids get the same prediction, so look
+    # them up in the cache and only run the model on the distinct misses.
+    # Sequence modes give different outputs, so they are cached separately.
+    version = (getattr(model, 'version', None), sequence_mode)
+    keys = [row.tobytes() for row in padded]
+    probs = [None] * len(texts)
+    missing = {}
+    for i, key in enumerate(keys):
+        if cache is not None:
+            probs[i] = cache.get(version, key)
+        if probs[i] is None:
+            missing.setdefault(key, []).append(i)
+
+    if missing:
+        rows = [indices[0] for indices in missing.values()]
+        batch_probs = forward_probabilities(model, padded[rows], device, sequence_mode)
+
+        for (key, indices), row_probs in zip(missing.items(), batch_probs):
+            for i in indices:
+                probs[i] = row_probs
+            if cache is not None:
+                # A copy: the row is a view that would keep the whole batch array alive
+                cache.put(version, key, row_probs.copy())
+
+    probs = np.stack(probs)
+    pred_idx = np.argmax(probs, axis=1)
+
     # Get confidences and labels
-    confidences = (probs[0].cpu().numpy() * 100).tolist()
+    all_confidences = (probs * 100).tolist()
     labels = label_encoder.classes_
-    
-    # Prepare results
-    results = {
-        'text': text,
-        'predicted_sentiment': label_encoder.inverse_transform([pred_idx])[0],
-        'confidences': {
-            label: float(conf) for label, conf in zip(labels, confidences)
-        },
-        'chart_data': [
-            {'sentiment': label, 'confidence': float(conf)} 
-            for label, conf in zip(labels, confidences)
-        ]
-    }
-    
-    return results
\ No newline at end of file
+    predicted = label_encoder.inverse_transform(pred_idx)
+
+    # Prepare one result per input text, in input order
+    model_version = getattr(model, 'version', None)
+    results = []
+    for text, sentiment, confidences in zip(texts, predicted, all_confidences):
+        results.append({
+            'text': text,
+            'predicted_sentiment': sentiment,
+            'confidences': {
+                label: float(conf) for label, conf in zip(labels, confidences)
+            },
+            'chart_data': [
+                {'sentiment': label, 'confidence': float(conf)}
+                for label, conf in zip(labels, confidences)
+            ],
+            'model_version': model_version
+        })
+
+    return results
+
+def predict_sentiment(text, model, tokenizer, label_encoder, device, max_len=100, cache=None):
+    return predict_sentiments([text], model, tokenizer, label_encoder, device, max_len, cache)[0]
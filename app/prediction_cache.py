@@ -0,0 +1,85 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Cache settings
+PREDICTION_CACHE_MAX_BYTES = int(os.getenv("PREDICTION_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+PREDICTION_CACHE_TTL_SECONDS = float(os.getenv("PREDICTION_CACHE_TTL_SECONDS", "3600"))
+
+# Rough per-entry cost on top of the key bytes: OrderedDict node, tuple,
+# float timestamp and a small probability array
+ENTRY_OVERHEAD_BYTES = 320
+
+# LRU + TTL cache of class probabilities keyed on the model version and the
+# padded token ids. Versions served side by side (a canary, or an old version
+# finishing its requests) share the budget; a retired version's entries age
+# out through the LRU.
+class PredictionCache:
+    def __init__(self, max_bytes=PREDICTION_CACHE_MAX_BYTES, ttl_seconds=PREDICTION_CACHE_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, version, key):
+        key = (version, key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            probs, expires_at = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return probs
+
+    def put(self, version, key, probs):
+        if self.max_bytes <= 0:
+            return
+        key = (version, key)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (probs, time.monotonic() + self.ttl_seconds)
+            self._bytes += len(key[1]) + ENTRY_OVERHEAD_BYTES
+
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        del self._entries[key]
+        self._bytes -= len(key[1]) + ENTRY_OVERHEAD_BYTES
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions
+            }
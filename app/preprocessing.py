@@ -0,0 +1,148 @@
+import json
+import numpy as np
+from vocab_file import write_vocab_file, MappedVocabulary
+
+# Default filters of the Keras Tokenizer the model was trained with
+KERAS_DEFAULT_FILTERS = '!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~\t\n'
+
+# Drop-in replacement for the pickled Keras Tokenizer at serving time.
+# Reproduces Tokenizer.texts_to_sequences exactly without importing TensorFlow.
+class SequenceTokenizer:
+    def __init__(self, word_index, num_words=None, oov_token=None,
+                 filters=KERAS_DEFAULT_FILTERS, lower=True, split=" ", char_level=False):
+        self.word_index = word_index
+        self.num_words = num_words
+        self.oov_token = oov_token
+        self.filters = filters
+        self.lower = lower
+        self.split = split
+        self.char_level = char_level
+        self._translate_map = str.maketrans({c: split for c in filters}) if filters else None
+
+    @classmethod
+    def from_keras(cls, tokenizer):
+        if getattr(tokenizer, "analyzer", None) is not None:
+            raise ValueError("Tokenizers with a custom analyzer cannot be converted")
+        return cls(
+            word_index=dict(tokenizer.word_index),
+            num_words=tokenizer.num_words,
+            oov_token=tokenizer.oov_token,
+            filters=tokenizer.filters,
+            lower=tokenizer.lower,
+            split=tokenizer.split,
+            char_level=tokenizer.char_level
+        )
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(**data)
+
+    @classmethod
+    def load_compact(cls, path):
+        vocabulary = MappedVocabulary(path)
+        return cls(word_index=vocabulary, **vocabulary.config)
+
+    def _config(self):
+        return {
+            "num_words": self.num_words,
+            "oov_token": self.oov_token,
+            "filters": self.filters,
+            "lower": self.lower,
+            "split": self.split,
+            "char_level": self.char_level
+        }
+
+    def save(self, path):
+        data = {"word_index": dict(self.word_index.items()), **self._config()}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    def trimmed_word_index(self):
+        # Words at or beyond num_words never reach the model; they map to the
+        # OOV index (or are dropped) whether or not they are in the vocabulary
+        if not self.num_words:
+            return dict(self.word_index.items())
+        trimmed = {word: i for word, i in self.word_index.items() if i < self.num_words}
+        if self.oov_token is not None and self.oov_token in self.word_index:
+            trimmed[self.oov_token] = self.word_index[self.oov_token]
+        return trimmed
+
+    def save_compact(self, path):
+        write_vocab_file(path, self.trimmed_word_index(), self._config())
+
+    def _split_words(self, text):
+        if self.lower:
+            text = text.lower()
+        if self.char_level:
+            return text
+        if self._translate_map is not None:
+            text = text.translate(self._translate_map)
+        return [word for word in text.split(self.split) if word]
+
+    def texts_to_sequences(self, texts):
+        word_index = self.word_index
+        num_words = self.num_words
+        oov_index = word_index.get(self.oov_token) if self.oov_token is not None else None
+
+        sequences = []
+        for text in texts:
+            seq = []
+            for word in self._split_words(text):
+                i = word_index.get(word)
+                if i is not None:
+                    if num_words and i >= num_words:
+                        if oov_index is not None:
+                            seq.append(oov_index)
+                    else:
+                        seq.append(i)
+                elif self.oov_token is not None:
+                    seq.append(oov_index)
+            sequences.append(seq)
+        return sequences
+
+# NumPy version of keras.preprocessing.sequence.pad_sequences for 1-D integer sequences
+def pad_sequences(sequences, maxlen=None, dtype="int32", padding="pre", truncating="pre", value=0):
+    if padding not in ("pre", "post"):
+        raise ValueError(f"Padding type '{padding}' not understood")
+    if truncating not in ("pre", "post"):
+        raise ValueError(f"Truncating type '{truncating}' not understood")
+
+    if maxlen is None:
+        maxlen = max((len(s) for s in sequences), default=0)
+
+    padded = np.full((len(sequences), maxlen), value, dtype=dtype)
+    if maxlen == 0:
+        return padded
+
+    for idx, seq in enumerate(sequences):
+        if not len(seq):
+            continue
+        trunc = seq[-maxlen:] if truncating == "pre" else seq[:maxlen]
+        if padding == "post":
+            padded[idx, :len(trunc)] = trunc
+        else:
+            padded[idx, -len(trunc):] = trunc
+    return padded
+
+# Replacement for the pickled sklearn LabelEncoder; only decoding is needed when serving
+class LabelDecoder:
+    def __init__(self, classes):
+        self.classes_ = np.asarray(classes)
+
+    @classmethod
+    def from_label_encoder(cls, label_encoder):
+        return cls(label_encoder.classes_)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f)["classes"])
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"classes": self.classes_.tolist()}, f, ensure_ascii=False)
+
+    def inverse_transform(self, y):
+        return self.classes_[np.asarray(y, dtype=np.intp)]
@@ -0,0 +1,34 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import torch
+from model_loader import build_model, quantize_model, compute_model_version, WEIGHTS_FILE, QUANTIZED_WEIGHTS_FILE, QUANTIZED_SOURCE_FILE
+
+# Writes a dynamic int8 copy of models/lstm_sentiment_model.pth, which
+# model_loader picks up when MODEL_QUANTIZATION=dynamic_int8, and records which
+# fp32 weights it came from; after retraining, the stale copy is ignored.
+# Compare it with fp32 first: benchmark.py quantization --heldout FILE
+
+def convert(model_dir):
+    weights_path = os.path.join(model_dir, WEIGHTS_FILE)
+    quantized_path = os.path.join(model_dir, QUANTIZED_WEIGHTS_FILE)
+
+    model = build_model()
+    model.load_state_dict(torch.load(weights_path, map_location="cpu"))
+    quantized = quantize_model(model.eval())
+    torch.save(quantized.state_dict(), quantized_path)
+
+    # model_loader only uses the artifact while the fp32 weights still match this
+    with open(os.path.join(model_dir, QUANTIZED_SOURCE_FILE), "w") as f:
+        f.write(compute_model_version(weights_path))
+
+    print(f"Wrote {quantized_path} ({os.path.getsize(quantized_path) / 1e6:.1f} MB, "
+          f"fp32 {os.path.getsize(weights_path) / 1e6:.1f} MB)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the fp32 LSTM weights to a dynamic int8 artifact")
+    parser.add_argument("--model-dir", default="models")
+    args = parser.parse_args()
+    convert(args.model_dir)
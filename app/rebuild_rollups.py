@@ -0,0 +1,93 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import time
+from mysql.connector import Error
+from database import get_db_connection, create_tables
+from rollups import ROLLUP_GRANULARITIES, aggregate_statements, bucket_start
+
+# Recomputes sentiment_rollups from the reviews table, e.g. after
+# backfill_review_columns.py or after changing SENTIMENT_ROLLUP_PER_USER.
+#
+#   python rebuild_rollups.py --batch-size 50000
+#
+# The new rollups are aggregated into a staging table in primary-key ranges,
+# with short transactions and no table locks. Only the final step locks the
+# tables: it adds reviews written in the meantime and copies the staging rows
+# over, so review writes pause for a moment rather than for the whole rebuild.
+#
+# A review can commit after its id range was aggregated (ids are assigned at
+# insert, not at commit). So the final step drops and re-aggregates every
+# bucket from --late-seconds before the rebuild started onwards; a review is
+# only missed if its transaction was open for longer than that.
+
+STAGING_TABLE = "sentiment_rollups_rebuild"
+
+def rebuild(batch_size, sleep_seconds, late_seconds):
+    create_tables()
+
+    connection = get_db_connection()
+    if connection is None:
+        return False
+    cursor = connection.cursor()
+    statements = aggregate_statements(STAGING_TABLE)
+
+    try:
+        cursor.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+        cursor.execute(f"CREATE TABLE {STAGING_TABLE} LIKE sentiment_rollups")
+        cursor.execute("SELECT NOW() - INTERVAL %s SECOND", (late_seconds,))
+        since = cursor.fetchone()[0]
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM reviews")
+        high_id = cursor.fetchone()[0]
+        connection.commit()
+
+        started = time.perf_counter()
+        for low in range(0, high_id, batch_size):
+            high = min(low + batch_size, high_id)
+            for statement in statements:
+                cursor.execute(statement, (low, high))
+            connection.commit()
+            print(f"Aggregated reviews with id <= {high} of {high_id} ({time.perf_counter() - started:.1f}s)")
+            if sleep_seconds:
+                time.sleep(sleep_seconds)
+
+        cursor.execute(f"LOCK TABLES reviews READ, sentiment_rollups WRITE, {STAGING_TABLE} WRITE")
+        try:
+            for granularity in ROLLUP_GRANULARITIES:
+                # Recent buckets from scratch, plus older reviews that got an id past high_id
+                start = bucket_start(since, granularity)
+                cursor.execute(f"DELETE FROM {STAGING_TABLE} WHERE granularity = %s AND bucket_start >= %s",
+                               (granularity, start))
+                for statement in aggregate_statements(STAGING_TABLE, "created_at >= %s OR id > %s", (granularity,)):
+                    cursor.execute(statement, (start, high_id))
+            cursor.execute("DELETE FROM sentiment_rollups")
+            cursor.execute(f"INSERT INTO sentiment_rollups SELECT * FROM {STAGING_TABLE}")
+            connection.commit()
+        finally:
+            cursor.execute("UNLOCK TABLES")
+
+        cursor.execute("SELECT COUNT(*) FROM sentiment_rollups")
+        print(f"Done: {cursor.fetchone()[0]} rollup rows in {time.perf_counter() - started:.1f}s")
+        return True
+    except Error as e:
+        print(f"Database error: {e}")
+        connection.rollback()
+        return False
+    finally:
+        try:
+            cursor.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+        except Error as e:
+            print(f"Error dropping {STAGING_TABLE}: {e}")
+        cursor.close()
+        connection.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute the sentiment rollup tables from the reviews table")
+    parser.add_argument("--batch-size", type=int, default=50000, help="primary-key range per transaction")
+    parser.add_argument("--sleep", type=float, default=0.0, help="pause between batches, in seconds")
+    parser.add_argument("--late-seconds", type=int, default=300,
+                        help="re-aggregate buckets from this long before the start, for reviews that commit late")
+    args = parser.parse_args()
+    sys.exit(0 if rebuild(args.batch_size, args.sleep, args.late_seconds) else 1)
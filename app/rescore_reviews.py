@@ -0,0 +1,199 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import json
+import time
+from mysql.connector import Error, errorcode
+from database import get_db_connection, create_tables
+from review_columns import SENTIMENT_LABELS, RESULT_COLUMNS, result_column_values
+from rollups import rollup_delta_rows, upsert_rollups_statement, DECREMENT_ROLLUPS_SQL
+from model_manager import initial_version, version_dir
+
+# Re-scores stored reviews with the current model, e.g. after retraining and
+# replacing the weights. Every review records the model_version that produced
+# its prediction; reviews with any other version (or none) are re-scored.
+#
+#   python rescore_reviews.py --chunk-size 1000 --max-rate 2000
+#
+# The table is walked in primary-key order, one chunk at a time. Inference runs
+# outside any transaction; each chunk is then written with one multi-row UPDATE,
+# together with the matching rollup changes, in a short transaction. The UPDATE
+# only touches rows whose version is still the one that was read, and the chunk
+# is retried if anything changed in between, so the rollups stay exact.
+#
+# Throttling: inference uses --torch-threads threads (1 by default, leaving the
+# other cores to the app), and --max-rate / --sleep space the chunks out.
+# The last finished id is saved in --checkpoint, so the job can be stopped at
+# any time and resumes where it left off for the same model version.
+
+DEADLOCK_RETRIES = 3
+
+def load_checkpoint(path, model_version):
+    if not os.path.exists(path):
+        return 0, 0
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint["model_version"] != model_version:
+        print(f"Ignoring {path}: it was written for model {checkpoint['model_version']}")
+        return 0, 0
+    return checkpoint["last_id"], checkpoint["rescored"]
+
+def save_checkpoint(path, model_version, last_id, rescored):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"model_version": model_version, "last_id": last_id, "rescored": rescored}, f)
+    os.replace(tmp_path, path)
+
+def read_chunk(cursor, model_version, after_id, chunk_size):
+    cursor.execute(
+        f"""
+        SELECT id, user_id, review_text, created_at, predicted_sentiment,
+               {', '.join(f'confidence_{label}' for label in SENTIMENT_LABELS)}, model_version
+        FROM reviews
+        WHERE id > %s AND NOT (model_version <=> %s)
+        ORDER BY id
+        LIMIT %s
+        """,
+        (after_id, model_version, chunk_size)
+    )
+    return cursor.fetchall()
+
+def write_chunk(connection, cursor, rows, results):
+    # One UPDATE for the whole chunk: the new values are joined in as a derived table
+    new_values = " UNION ALL ".join(
+        ["SELECT %s AS id, %s AS old_version, " + ", ".join(f"%s AS {column}" for column in RESULT_COLUMNS)]
+        * len(rows)
+    )
+    params = []
+    for row, row_results in zip(rows, results):
+        params.extend((row["id"], row["model_version"]) + result_column_values(row_results))
+    assignments = ", ".join(f"r.{column} = v.{column}" for column in RESULT_COLUMNS)
+
+    changes = []
+    for row, row_results in zip(rows, results):
+        old_label = row["predicted_sentiment"]
+        new_label = str(row_results["predicted_sentiment"])
+        changes.append((
+            row["created_at"], row["user_id"],
+            old_label, row.get(f"confidence_{old_label}") if old_label else None,
+            new_label, row_results["confidences"][row_results["predicted_sentiment"]]
+        ))
+    upserts, decrements = rollup_delta_rows(changes)
+
+    connection.start_transaction()
+    try:
+        # The typed columns are authoritative now; the legacy JSON would be stale
+        cursor.execute(
+            f"UPDATE reviews r JOIN ({new_values}) v ON r.id = v.id "
+            f"SET {assignments}, r.sentiment_results = NULL "
+            "WHERE r.model_version <=> v.old_version",
+            params
+        )
+        if cursor.rowcount != len(rows):
+            # A row changed since it was read; its rollup delta would be wrong
+            connection.rollback()
+            return False
+        if upserts:
+            cursor.execute(*upsert_rollups_statement(upserts))
+        if decrements:
+            cursor.executemany(DECREMENT_ROLLUPS_SQL, decrements)
+        connection.commit()
+        return True
+    except Exception:
+        connection.rollback()
+        raise
+
+def rescore(args):
+    from model_loader import load_model_components
+    from predict import predict_sentiments
+    from prediction_cache import PredictionCache
+    import torch
+
+    if args.torch_threads > 0:
+        torch.set_num_threads(args.torch_threads)
+    model, tokenizer, label_encoder, device, _ = load_model_components(args.model_dir)
+    cache = PredictionCache()
+    print(f"Re-scoring reviews not produced by model {model.version}")
+
+    create_tables()
+    connection = get_db_connection()
+    if connection is None:
+        return False
+    cursor = connection.cursor(dictionary=True)
+
+    last_id, rescored = (args.start_id, 0) if args.start_id is not None else load_checkpoint(args.checkpoint, model.version)
+    started = time.perf_counter()
+    scored_this_run = 0
+    try:
+        while True:
+            chunk_started = time.perf_counter()
+            rows = read_chunk(cursor, model.version, last_id, args.chunk_size)
+            connection.commit()
+            if not rows:
+                break
+
+            texts = [row["review_text"] for row in rows]
+            results = []
+            for i in range(0, len(texts), args.batch_size):
+                results.extend(predict_sentiments(texts[i:i + args.batch_size], model, tokenizer, label_encoder,
+                                                  device, cache=cache))
+
+            for attempt in range(DEADLOCK_RETRIES + 1):
+                try:
+                    written = write_chunk(connection, cursor, rows, results)
+                    break
+                except Error as e:
+                    # Live inserts lock the same rollup rows; back off and retry
+                    if e.errno not in (errorcode.ER_LOCK_DEADLOCK, errorcode.ER_LOCK_WAIT_TIMEOUT) or attempt == DEADLOCK_RETRIES:
+                        raise
+                    print(f"Retrying chunk after ids > {last_id}: {e}")
+                    time.sleep(0.5 * 2 ** attempt)
+            if not written:
+                # Read the chunk again; the rows that changed are picked up with their new values
+                continue
+
+            last_id = rows[-1]["id"]
+            rescored += len(rows)
+            scored_this_run += len(rows)
+            save_checkpoint(args.checkpoint, model.version, last_id, rescored)
+
+            elapsed = time.perf_counter() - started
+            print(f"ids <= {last_id}: {rescored} reviews re-scored ({scored_this_run / max(elapsed, 1e-9):.0f} rows/s)")
+
+            # Throttle: at most max_rate rows per second, plus an optional fixed pause
+            pause = args.sleep
+            if args.max_rate:
+                pause = max(pause, len(rows) / args.max_rate - (time.perf_counter() - chunk_started))
+            if pause > 0:
+                time.sleep(pause)
+
+        cursor.execute("SELECT COUNT(*) AS remaining FROM reviews WHERE NOT (model_version <=> %s)", (model.version,))
+        remaining = cursor.fetchone()["remaining"]
+        connection.commit()
+        print(f"Done: {rescored} reviews re-scored with model {model.version}, {remaining} reviews on other versions")
+        if remaining == 0 and os.path.exists(args.checkpoint):
+            os.remove(args.checkpoint)
+        return True
+    except Error as e:
+        print(f"Database error: {e}")
+        connection.rollback()
+        return False
+    finally:
+        cursor.close()
+        connection.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-score stored reviews that were produced by another model version")
+    parser.add_argument("--model-dir", default=version_dir(initial_version()),
+                        help="default: the registry's active version (MODEL_REGISTRY_DIR), else MODEL_DIR")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="reviews read and updated per transaction")
+    parser.add_argument("--batch-size", type=int, default=256, help="texts per model call")
+    parser.add_argument("--torch-threads", type=int, default=1, help="0 for the torch default")
+    parser.add_argument("--max-rate", type=float, default=0, help="at most this many reviews per second (0: no limit)")
+    parser.add_argument("--sleep", type=float, default=0.0, help="pause between chunks, in seconds")
+    parser.add_argument("--checkpoint", default="rescore_reviews.checkpoint", help="file holding the last finished id")
+    parser.add_argument("--start-id", type=int, help="start after this id and ignore the checkpoint")
+    args = parser.parse_args()
+    sys.exit(0 if rescore(args) else 1)
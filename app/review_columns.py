@@ -0,0 +1,56 @@
+import json
+from typing import Dict, Any, Optional, Tuple
+
+# Predictions are stored in typed columns rather than the old sentiment_results
+# JSON blob, so the label can be indexed and aggregated and reads skip JSON parsing.
+# The model has one output per label; each label gets a confidence column.
+SENTIMENT_LABELS = ("negative", "neutral", "positive")
+
+RESULT_COLUMNS = ("predicted_sentiment",) + tuple(f"confidence_{label}" for label in SENTIMENT_LABELS) + ("model_version",)
+
+# Column list for INSERTs, after user_id and review_text, and one row of placeholders for all of them
+RESULT_COLUMNS_SQL = ", ".join(RESULT_COLUMNS)
+REVIEW_PLACEHOLDERS = ", ".join(["%s"] * (2 + len(RESULT_COLUMNS)))
+
+# SELECT list for reviews aliased as r. Rows written before the migration keep
+# their JSON until backfill_review_columns.py has run; only those rows return it.
+RESULT_SELECT_SQL = (
+    ", ".join(f"r.{column}" for column in RESULT_COLUMNS)
+    + ", IF(r.predicted_sentiment IS NULL, r.sentiment_results, NULL) AS legacy_results"
+)
+
+def result_column_values(results: Dict[str, Any]) -> Tuple:
+    # Labels come out of the model as numpy strings, which the MySQL drivers do not all accept
+    confidences = results.get("confidences", {})
+    return (
+        (str(results["predicted_sentiment"]),)
+        + tuple(None if confidences.get(label) is None else float(confidences[label]) for label in SENTIMENT_LABELS)
+        + (results.get("model_version"),)
+    )
+
+def results_from_columns(review_text: str, predicted_sentiment: Optional[str], confidences: Dict[str, Any],
+                         model_version: Optional[str] = None) -> Dict[str, Any]:
+    # Same shape predict_sentiments returns
+    return {
+        "text": review_text,
+        "predicted_sentiment": predicted_sentiment,
+        "confidences": confidences,
+        "chart_data": [
+            {"sentiment": label, "confidence": confidence}
+            for label, confidence in confidences.items()
+        ],
+        "model_version": model_version
+    }
+
+def results_from_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    legacy_results = row.pop("legacy_results", None)
+    if row.get("predicted_sentiment") is None and legacy_results:
+        return json.loads(legacy_results)
+
+    confidences = {}
+    for label in SENTIMENT_LABELS:
+        confidence = row.get(f"confidence_{label}")
+        if confidence is not None:
+            confidences[label] = float(confidence)
+    return results_from_columns(row["review_text"], row.get("predicted_sentiment"), confidences,
+                                row.get("model_version"))
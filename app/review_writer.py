@@ -0,0 +1,168 @@
+import asyncio
+import os
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# How /predict stores reviews:
+#   sync   the request waits until its review is committed (default)
+#   async  the review is queued and the response returns right away; a background
+#          task writes queued reviews in multi-row INSERTs. Reviews still queued
+#          when the process dies are lost.
+REVIEW_PERSISTENCE = os.getenv("REVIEW_PERSISTENCE", "sync")
+
+# Write-behind settings
+REVIEW_QUEUE_MAX_SIZE = int(os.getenv("REVIEW_QUEUE_MAX_SIZE", "10000"))
+REVIEW_FLUSH_MAX_BATCH = int(os.getenv("REVIEW_FLUSH_MAX_BATCH", "500"))
+REVIEW_FLUSH_INTERVAL_MS = float(os.getenv("REVIEW_FLUSH_INTERVAL_MS", "200"))
+REVIEW_ENQUEUE_TIMEOUT_SECONDS = float(os.getenv("REVIEW_ENQUEUE_TIMEOUT_SECONDS", "2"))
+REVIEW_FLUSH_RETRIES = int(os.getenv("REVIEW_FLUSH_RETRIES", "3"))
+
+class ReviewQueueFullError(Exception):
+    pass
+
+# Queues reviews in memory and writes them behind the request.
+# A flush runs when max_batch_size reviews are waiting or flush_interval_ms after
+# the oldest one arrived, whichever comes first. When the database falls behind,
+# the bounded queue fills up and enqueue() waits, up to enqueue_timeout seconds,
+# before giving up with ReviewQueueFullError. Failed flushes are retried; when
+# write_fn raises one of row_errors, one entry is bad, so the batch is split
+# until only that entry is dropped.
+class ReviewWriter:
+    def __init__(self, write_fn, max_queue_size=REVIEW_QUEUE_MAX_SIZE, max_batch_size=REVIEW_FLUSH_MAX_BATCH,
+                 flush_interval_ms=REVIEW_FLUSH_INTERVAL_MS, enqueue_timeout=REVIEW_ENQUEUE_TIMEOUT_SECONDS,
+                 retries=REVIEW_FLUSH_RETRIES, row_errors=()):
+        # write_fn is a coroutine function that stores a list of
+        # (user_id, review_text, sentiment_results) entries in one transaction
+        self.write_fn = write_fn
+        self.row_errors = row_errors
+        self.max_queue_size = max_queue_size
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.enqueue_timeout = enqueue_timeout
+        self.retries = retries
+        self._queue = None
+        self._space = None
+        self._worker = None
+        self._closed = False
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.last_flush_seconds = None
+
+    def _ensure_worker(self):
+        if self._closed:
+            raise RuntimeError("Review writer is stopped")
+        if self._worker is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            # Notified by the worker whenever it takes a review off the queue
+            self._space = asyncio.Condition()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def enqueue(self, user_id, review_text, sentiment_results):
+        self._ensure_worker()
+        try:
+            await asyncio.wait_for(self._queue.put((user_id, review_text, sentiment_results)), self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            raise ReviewQueueFullError(f"Review queue full ({self.max_queue_size} pending)")
+
+    async def enqueue_many(self, entries):
+        # All or nothing: a batch that was only partly queued would still be
+        # written in part, and the client's retry would store those reviews twice
+        entries = [tuple(entry) for entry in entries]
+        self._ensure_worker()
+        if self.max_queue_size > 0:
+            if len(entries) > self.max_queue_size:
+                raise ReviewQueueFullError(f"Batch of {len(entries)} reviews exceeds the queue size ({self.max_queue_size})")
+            async with self._space:
+                try:
+                    await asyncio.wait_for(
+                        self._space.wait_for(lambda: self.max_queue_size - self._queue.qsize() >= len(entries)),
+                        self.enqueue_timeout
+                    )
+                except asyncio.TimeoutError:
+                    raise ReviewQueueFullError(f"Review queue full ({self._queue.qsize()} pending)")
+        # No await from the capacity check to here, so every put fits
+        for entry in entries:
+            self._queue.put_nowait(entry)
+
+    async def _taken(self, entry):
+        # Wake enqueue_many calls waiting for room
+        async with self._space:
+            self._space.notify_all()
+        return entry
+
+    async def _collect(self):
+        batch = [await self._taken(await self._queue.get())]
+        deadline = asyncio.get_running_loop().time() + self.flush_interval
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await self._taken(await asyncio.wait_for(self._queue.get(), remaining)))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _flush(self, batch):
+        for attempt in range(self.retries + 1):
+            start = time.perf_counter()
+            try:
+                await self.write_fn(batch)
+                self.written += len(batch)
+                self.batches += 1
+                self.last_flush_seconds = time.perf_counter() - start
+                return
+            except self.row_errors as e:
+                if len(batch) == 1:
+                    self.dropped += 1
+                    print(f"Dropped a queued review that cannot be written: {e}")
+                    return
+                # Write the halves separately, so the other reviews still get in
+                print(f"Splitting {len(batch)} queued reviews after a row error: {e}")
+                middle = len(batch) // 2
+                await self._flush(batch[:middle])
+                await self._flush(batch[middle:])
+                return
+            except Exception as e:
+                print(f"Error writing {len(batch)} queued reviews (attempt {attempt + 1}): {e}")
+                if attempt < self.retries:
+                    await asyncio.sleep(0.5 * 2 ** attempt)
+
+        self.dropped += len(batch)
+        print(f"Dropped {len(batch)} queued reviews after {self.retries + 1} attempts")
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def stats(self):
+        return {
+            "mode": REVIEW_PERSISTENCE,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "max_queue_size": self.max_queue_size,
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "last_flush_seconds": self.last_flush_seconds
+        }
+
+    async def stop(self):
+        # Refuse new reviews, write everything already queued, then stop the worker
+        self._closed = True
+        if self._worker is None:
+            return
+        await self._queue.join()
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
@@ -0,0 +1,119 @@
+import os
+from datetime import datetime
+from typing import List, Dict, Any, Tuple
+from dotenv import load_dotenv
+from review_columns import SENTIMENT_LABELS
+
+load_dotenv()
+
+# Pre-aggregated review counts and confidence sums per predicted label and time
+# bucket, so analytics read a few rows per bucket instead of scanning reviews.
+# user_id 0 holds the totals over all users; per-user rows are optional.
+ROLLUP_GRANULARITIES = ("hour", "day")
+ROLLUP_PER_USER = os.getenv("SENTIMENT_ROLLUP_PER_USER", "true").lower() in ("1", "true", "yes")
+ALL_USERS = 0
+
+CREATE_ROLLUPS_TABLE = """
+CREATE TABLE IF NOT EXISTS sentiment_rollups (
+    granularity ENUM('hour', 'day') NOT NULL,
+    user_id INT NOT NULL DEFAULT 0,
+    bucket_start DATETIME NOT NULL,
+    predicted_sentiment VARCHAR(16) NOT NULL,
+    review_count INT UNSIGNED NOT NULL DEFAULT 0,
+    confidence_sum DOUBLE NOT NULL DEFAULT 0,
+    PRIMARY KEY (granularity, user_id, bucket_start, predicted_sentiment)
+)
+"""
+
+ROLLUP_COLUMNS_SQL = "granularity, user_id, bucket_start, predicted_sentiment, review_count, confidence_sum"
+ROLLUP_ACCUMULATE_SQL = (
+    "ON DUPLICATE KEY UPDATE review_count = review_count + VALUES(review_count), "
+    "confidence_sum = confidence_sum + VALUES(confidence_sum)"
+)
+
+def bucket_start(created_at: datetime, granularity: str) -> datetime:
+    if granularity == "hour":
+        return created_at.replace(minute=0, second=0, microsecond=0)
+    return created_at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def rollup_rows(created_at: datetime, entries: List[Tuple[int, Dict[str, Any]]]) -> List[Tuple]:
+    # entries are (user_id, sentiment_results) pairs. Reviews written by one
+    # INSERT share created_at, so they all fall in the same buckets.
+    totals = {}
+    for user_id, results in entries:
+        label = str(results["predicted_sentiment"])
+        confidence = float(results["confidences"][results["predicted_sentiment"]])
+        for user in ((ALL_USERS, user_id) if ROLLUP_PER_USER else (ALL_USERS,)):
+            count, confidence_sum = totals.get((user, label), (0, 0.0))
+            totals[(user, label)] = (count + 1, confidence_sum + confidence)
+
+    rows = [
+        (granularity, user, bucket_start(created_at, granularity), label, count, confidence_sum)
+        for granularity in ROLLUP_GRANULARITIES
+        for (user, label), (count, confidence_sum) in totals.items()
+    ]
+    # Concurrent writers lock the shared all-users rows in primary key order, so they cannot deadlock
+    return sorted(rows, key=lambda row: row[:4])
+
+def rollup_delta_rows(changes: List[Tuple]) -> Tuple[List[Tuple], List[Tuple]]:
+    # changes are (created_at, user_id, old_label, old_confidence, new_label,
+    # new_confidence) for re-scored reviews; old_label is None for reviews that
+    # were never counted. Returns the net rollup changes split into rows to
+    # upsert (count >= 0) and rows to decrement (count < 0; the counts are
+    # unsigned, so those cannot go through the INSERT). Both in primary key order.
+    totals = {}
+    for created_at, user_id, old_label, old_confidence, new_label, new_confidence in changes:
+        for label, sign, confidence in ((old_label, -1, old_confidence), (new_label, 1, new_confidence)):
+            if label is None:
+                continue
+            for granularity in ROLLUP_GRANULARITIES:
+                for user in ((ALL_USERS, user_id) if ROLLUP_PER_USER else (ALL_USERS,)):
+                    key = (granularity, user, bucket_start(created_at, granularity), str(label))
+                    count, confidence_sum = totals.get(key, (0, 0.0))
+                    totals[key] = (count + sign, confidence_sum + sign * float(confidence or 0.0))
+
+    upserts, decrements = [], []
+    for key in sorted(totals):
+        count, confidence_sum = totals[key]
+        if count < 0:
+            decrements.append((-count, -confidence_sum) + key)
+        elif count > 0 or confidence_sum:
+            upserts.append(key + (count, confidence_sum))
+    return upserts, decrements
+
+# Parameters: count, confidence_sum, then the primary key
+DECREMENT_ROLLUPS_SQL = (
+    "UPDATE sentiment_rollups SET review_count = review_count - %s, confidence_sum = confidence_sum - %s "
+    "WHERE granularity = %s AND user_id = %s AND bucket_start = %s AND predicted_sentiment = %s"
+)
+
+def upsert_rollups_statement(rows: List[Tuple]) -> Tuple[str, List[Any]]:
+    placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(rows))
+    params = [value for row in rows for value in row]
+    return f"INSERT INTO sentiment_rollups ({ROLLUP_COLUMNS_SQL}) VALUES {placeholders} {ROLLUP_ACCUMULATE_SQL}", params
+
+def aggregate_statements(table: str, where: str = "id > %s AND id <= %s",
+                         granularities: Tuple[str, ...] = ROLLUP_GRANULARITIES) -> List[str]:
+    # INSERT ... SELECT statements that add the reviews matching `where` (by
+    # default low < id <= high) into `table`. Used by rebuild_rollups.py;
+    # mirrors rollup_rows.
+    confidence = "CASE predicted_sentiment " + " ".join(
+        f"WHEN '{label}' THEN confidence_{label}" for label in SENTIMENT_LABELS
+    ) + " END"
+    buckets = {
+        "hour": "DATE_FORMAT(created_at, '%%Y-%%m-%%d %%H:00:00')",
+        "day": "DATE(created_at)",
+    }
+    users = ["0", "user_id"] if ROLLUP_PER_USER else ["0"]
+
+    statements = []
+    for granularity in granularities:
+        for user in users:
+            statements.append(
+                f"INSERT INTO {table} ({ROLLUP_COLUMNS_SQL}) "
+                f"SELECT '{granularity}', {user}, {buckets[granularity]}, predicted_sentiment, COUNT(*), "
+                f"COALESCE(SUM({confidence}), 0) "
+                f"FROM reviews WHERE ({where}) AND predicted_sentiment IS NOT NULL "
+                f"GROUP BY 2, 3, 4 {ROLLUP_ACCUMULATE_SQL}"
+            )
+    return statements
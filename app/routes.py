@@ -2,22 +2,36 @@ from fastapi import APIRouter, Request, Form, Depends, HTTPException, status
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from fastapi.exceptions import HTTPException
-from model_loader import load_model_components
-from predict import predict_sentiment
-from database import get_db_connection
-from auth import hash_password, verify_password, create_access_token, verify_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from model_manager import ModelManager, ModelNotReadyError
+from review_writer import ReviewWriter, ReviewQueueFullError, REVIEW_PERSISTENCE
+from user_cache import user_cache
+from password_pool import PasswordPool, PasswordPoolBusyError, PASSWORD_HASH_RETRY_AFTER_SECONDS
+from async_crud import (
+    get_user_by_email, email_or_cnic_registered, create_user, create_review, create_reviews,
+    get_recent_reviews_by_user, insert_reviews, get_cached_user, REVIEW_ROW_ERRORS
+)
+from auth import create_access_token, verify_token, decode_token, ACCESS_TOKEN_EXPIRE_MINUTES
 from models import UserCreate
-import mysql.connector
-from mysql.connector import Error
+from aiomysql import Error
 from datetime import timedelta
 from models import UserRole
 import json
+import os
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 
-# Load model components once
-model, tokenizer, label_encoder, device, max_len = load_model_components()
+# The model loads in the background at startup (or on first use), then
+# predictions run on its inference pool behind a micro-batcher
+model_manager = ModelManager()
+
+# With REVIEW_PERSISTENCE=async, reviews are written behind the response in batches
+review_writer = ReviewWriter(insert_reviews, row_errors=REVIEW_ROW_ERRORS)
+password_pool = PasswordPool()
+
+# Bulk scoring limits
+PREDICT_BATCH_MAX_TEXTS = int(os.getenv("PREDICT_BATCH_MAX_TEXTS", "5000"))
+PREDICT_BATCH_CHUNK_SIZE = int(os.getenv("PREDICT_BATCH_CHUNK_SIZE", "256"))
 
 # Landing page
 @router.get("/", response_class=HTMLResponse)
@@ -43,31 +57,23 @@ async def signup(request: Request):
     
     # Hash the password
     try:
-        hashed_password = hash_password(password)
+        hashed_password = await password_pool.hash(password)
+    except PasswordPoolBusyError as e:
+        print(f"Password pool busy: {e}")
+        raise HTTPException(status_code=503, detail="Too many sign-ups right now, try again",
+                            headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER_SECONDS)})
     except Exception as e:
         print(f"Error hashing password: {e}")
         raise HTTPException(status_code=500, detail="Error processing password")
     
     # Save to database
-    connection = get_db_connection()
-    if connection is None:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-    
-    cursor = connection.cursor()
-    
     try:
         # Check if email or CNIC already exists
-        cursor.execute("SELECT * FROM users WHERE email = %s OR cnic = %s", (email, cnic))
-        existing_user = cursor.fetchone()
-        if existing_user:
+        if await email_or_cnic_registered(email, cnic):
             raise HTTPException(status_code=400, detail="Email or CNIC already registered")
         
         # Insert new user with default role as USER
-        cursor.execute(
-            "INSERT INTO users (name, email, cnic, password, role) VALUES (%s, %s, %s, %s, %s)",
-            (name, email, cnic, hashed_password, UserRole.USER.value)
-        )
-        connection.commit()
+        await create_user(name, email, cnic, hashed_password, UserRole.USER)
         
         # Redirect to login page
         return RedirectResponse(url="/login", status_code=303)
@@ -79,27 +85,6 @@ async def signup(request: Request):
     except Exception as e:
         print(f"Unexpected error: {e}")
         raise HTTPException(status_code=500, detail="An unexpected error occurred")
-    except Exception as e:
-        print(f"Unexpected error: {e}")
-        raise HTTPException(status_code=500, detail="An unexpected error occurred")
-    finally:
-        # 1. Close cursor safely
-        if 'cursor' in locals() and cursor is not None:
-            try:
-                # The .close() method should handle cleanup, but we wrap it
-                cursor.close()
-            except Error as e:
-                # Catching the InternalError specifically
-                if "Unread result found" in str(e):
-                    print("Warning: Ignoring 'Unread result found' during cleanup.")
-                else:
-                    raise # Re-raise if it's a different DB error
-            except Exception:
-                 pass # Ignore other potential close errors
-
-        # 2. Close connection safely
-        if 'connection' in locals() and connection is not None:
-            connection.close()
 
 # Login page
 @router.get("/login", response_class=HTMLResponse)
@@ -171,29 +156,25 @@ async def login(request: Request):
     if not email or not password:
         raise HTTPException(status_code=400, detail="Email and password are required")
     
-    connection = get_db_connection()
-    if connection is None:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-    
-    cursor = connection.cursor(dictionary=True)
-    
     try:
-        cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
-        user = cursor.fetchone()
+        user = await get_user_by_email(email)
         
-        if not user or not verify_password(password, user["password"]):
+        if not user or not await password_pool.verify(password, user["password"]):
             raise HTTPException(status_code=401, detail="Invalid email or password")
         
-        # Create access token
+        # Create access token; the id and role ride along so later requests need no user lookup
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
-            data={"sub": user["email"]}, expires_delta=access_token_expires
+            data={"sub": user["email"], "uid": user["id"], "role": user.get("role", "user")},
+            expires_delta=access_token_expires
         )
         
         # Store user info in session
         request.session["user"] = user["email"]
         request.session["access_token"] = access_token
         request.session["role"] = user.get("role", "user") 
+        request.session["user_id"] = user["id"]
+        user_cache.put(user)
         
         # Redirect based on role
         if user.get("role") == "admin":
@@ -209,6 +190,10 @@ async def login(request: Request):
         response.headers["Expires"] = "0"
         
         return response
+    except PasswordPoolBusyError as e:
+        print(f"Password pool busy: {e}")
+        raise HTTPException(status_code=503, detail="Too many logins right now, try again",
+                            headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER_SECONDS)})
     except Error as e:
         print(f"Database error: {e}")
         raise HTTPException(status_code=500, detail="Login failed")
@@ -217,9 +202,6 @@ async def login(request: Request):
     except Exception as e:
         print(f"Unexpected error: {e}")
         raise HTTPException(status_code=500, detail="An unexpected error occurred")
-    finally:
-        cursor.close()
-        connection.close()
 
 
 
@@ -256,6 +238,17 @@ def get_current_user(request: Request):
     
     return email
 
+async def get_current_user_id(request: Request, email: str):
+    # Logins put the user id in the signed token claims, so this needs no query;
+    # sessions started before that fall back to the cached user row
+    token = request.session.get("access_token")
+    claims = decode_token(token) if token else None
+    if claims is not None and claims.get("sub") == email and claims.get("uid") is not None:
+        return claims["uid"]
+    
+    user_data = await get_cached_user(email)
+    return user_data["id"] if user_data else None
+
 def get_current_user_with_role(request: Request):
     user = request.session.get("user")
     if not user:
@@ -321,42 +314,114 @@ async def predict(request: Request):
         return {"error": "No text provided"}
     
     # Get sentiment analysis results
-    results = predict_sentiment(text, model, tokenizer, label_encoder, device, max_len)
-    
-    # Get user ID
-    connection = get_db_connection()
-    if connection is None:
-        return {"error": "Database connection failed"}
-    
-    cursor = connection.cursor(dictionary=True)
+    try:
+        results = await model_manager.submit(text)
+    except ModelNotReadyError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)}, headers={"Retry-After": "5"})
     
     try:
         # Get user ID
-        cursor.execute("SELECT id FROM users WHERE email = %s", (user,))
-        user_data = cursor.fetchone()
+        user_id = await get_current_user_id(request, user)
         
-        if not user_data:
+        if user_id is None:
             return {"error": "User not found"}
         
-        user_id = user_data["id"]
+        # Store review and results in database
+        if REVIEW_PERSISTENCE == "async":
+            await review_writer.enqueue(user_id, text, results)
+            return results
         
-        # Store review and results in database using CRUD function
-        from crud import create_review
-        review = create_review(user_id, text, results)
+        review = await create_review(user_id, text, results)
         
         if not review:
             return {"error": "Failed to store review"}
         
         return results
+    except ReviewQueueFullError as e:
+        print(f"Review queue full: {e}")
+        return JSONResponse(status_code=503, content={"error": "Too many pending reviews, try again"},
+                            headers={"Retry-After": "2"})
     except Error as e:
         print(f"Database error: {e}")
         return {"error": "Failed to store review"}
     except Exception as e:
         print(f"Unexpected error: {e}")
         return {"error": "An unexpected error occurred"}
-    finally:
-        cursor.close()
-        connection.close()
+
+def _parse_batch_texts(body: bytes, content_type: str):
+    # Accept a JSON array, {"texts": [...]}, or NDJSON with one text (or {"text": ...}) per line
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        items = [json.loads(line) for line in body.decode("utf-8").splitlines() if line.strip()]
+    else:
+        items = json.loads(body)
+        if isinstance(items, dict):
+            items = items.get("texts")
+
+    if not isinstance(items, list):
+        raise ValueError("Expected a JSON array of texts")
+
+    texts = []
+    for index, item in enumerate(items):
+        if isinstance(item, dict):
+            item = item.get("text")
+        if not isinstance(item, str) or not item.strip():
+            raise ValueError(f"Item {index} is not a non-empty text")
+        texts.append(item)
+    return texts
+
+# Bulk prediction endpoint (protected)
+@router.post("/api/predict/batch")
+async def predict_batch(request: Request):
+    user = get_current_user(request)
+    if user is None:
+        return JSONResponse(status_code=401, content={"error": "Not authenticated"})
+    
+    try:
+        texts = _parse_batch_texts(await request.body(), request.headers.get("content-type", ""))
+    except (ValueError, UnicodeDecodeError) as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    
+    if not texts:
+        return JSONResponse(status_code=400, content={"error": "No texts provided"})
+    if len(texts) > PREDICT_BATCH_MAX_TEXTS:
+        return JSONResponse(
+            status_code=413,
+            content={"error": f"At most {PREDICT_BATCH_MAX_TEXTS} texts per request"}
+        )
+    
+    # Score in fixed-size chunks so one large request cannot build a huge tensor.
+    # One chunk at a time, each taking a batcher slot in turn, so a bulk request
+    # cannot occupy every inference worker ahead of /predict.
+    results = []
+    try:
+        for start in range(0, len(texts), PREDICT_BATCH_CHUNK_SIZE):
+            results.extend(await model_manager.predict(texts[start:start + PREDICT_BATCH_CHUNK_SIZE]))
+    except ModelNotReadyError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)}, headers={"Retry-After": "5"})
+    
+    try:
+        user_id = await get_current_user_id(request, user)
+        if user_id is None:
+            return JSONResponse(status_code=404, content={"error": "User not found"})
+        
+        if REVIEW_PERSISTENCE == "async":
+            await review_writer.enqueue_many((user_id, text, result) for text, result in zip(texts, results))
+        else:
+            stored = await create_reviews(user_id, texts, results)
+            if stored != len(texts):
+                return JSONResponse(status_code=500, content={"error": "Failed to store reviews"})
+    except ReviewQueueFullError as e:
+        print(f"Review queue full: {e}")
+        return JSONResponse(status_code=503, content={"error": "Too many pending reviews, try again"},
+                            headers={"Retry-After": "2"})
+    except Error as e:
+        print(f"Database error: {e}")
+        return JSONResponse(status_code=500, content={"error": "Failed to store reviews"})
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        return JSONResponse(status_code=500, content={"error": "An unexpected error occurred"})
+    
+    return {"count": len(results), "results": results}
 
 @router.get("/api/user-reviews")
 async def get_user_reviews(request: Request):
@@ -365,44 +430,33 @@ async def get_user_reviews(request: Request):
     if user is None:
         return JSONResponse(status_code=401, content={"error": "Not authenticated"})
     
-    # Get user ID
-    connection = get_db_connection()
-    if connection is None:
-        return JSONResponse(status_code=500, content={"error": "Database connection failed"})
-    
-    cursor = connection.cursor(dictionary=True)
-    
     try:
         # Get user ID
-        cursor.execute("SELECT id FROM users WHERE email = %s", (user,))
-        user_data = cursor.fetchone()
+        user_id = await get_current_user_id(request, user)
         
-        if not user_data:
+        if user_id is None:
             return JSONResponse(status_code=404, content={"error": "User not found"})
         
-        user_id = user_data["id"]
-        
         # Get user reviews
-        cursor.execute(
-            "SELECT id, review_text, created_at FROM reviews WHERE user_id = %s ORDER BY created_at DESC LIMIT 5",
-            (user_id,)
-        )
-        reviews = cursor.fetchall()
-        
-        return reviews
+        return await get_recent_reviews_by_user(user_id, limit=5)
     except Error as e:
         print(f"Database error: {e}")
         return JSONResponse(status_code=500, content={"error": "Failed to fetch reviews"})
     except Exception as e:
         print(f"Unexpected error: {e}")
         return JSONResponse(status_code=500, content={"error": "An unexpected error occurred"})
-    finally:
-        cursor.close()
-        connection.close()
 
 @router.get("/api/check-auth")
 async def check_auth(request: Request):
     user = get_current_user(request)
     if user is None:
         return JSONResponse(status_code=401, content={"authenticated": False})
-    return {"authenticated": True, "user": user}
\ No newline at end of file
+    return {"authenticated": True, "user": user}
+
+# Readiness probe: 200 once the model is loaded and warmed up, 503 before that or after a failure
+@router.get("/health/ready")
+async def readiness():
+    status = model_manager.status()
+    if status["status"] != "ready":
+        return JSONResponse(status_code=503, content=status)
+    return status
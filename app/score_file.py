@@ -0,0 +1,256 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import csv
+import io
+import itertools
+import json
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from inference_pool import _init_process_worker, _predict_in_process_worker
+from review_columns import SENTIMENT_LABELS
+from model_manager import initial_version, version_dir
+
+# Scores a CSV or JSONL file of reviews offline, without the web app or the database.
+#
+#   python score_file.py dump.csv scored.csv --workers 4 --batch-size 256
+#
+# The input is read a batch at a time and batches fan out over a process pool;
+# every worker loads the model once, through model_loader. Results are written
+# in input order and only a few batches per worker are in flight, so memory
+# stays flat however large the file is.
+#
+# Every --checkpoint-every batches the output is synced to disk and the input
+# offset it corresponds to is saved next to it (<output>.checkpoint). Running
+# the same command again after a crash truncates the output to the last
+# checkpoint and carries on from there. The checkpoint is removed on success.
+
+PREDICTION_FIELDS = ["predicted_sentiment"] + [f"confidence_{label}" for label in SENTIMENT_LABELS] + ["model_version"]
+
+def _score_batch(texts):
+    # Runs in a worker; only the prediction fields travel back to the parent
+    return [
+        [str(result["predicted_sentiment"])]
+        + [result["confidences"].get(label) for label in SENTIMENT_LABELS]
+        + [result["model_version"]]
+        for result in _predict_in_process_worker(texts)
+    ]
+
+def file_format(path, requested):
+    if requested:
+        return requested
+    return "jsonl" if path.lower().endswith((".jsonl", ".ndjson")) else "csv"
+
+# Reads records together with the byte offset where each one ends, so a run
+# can resume in the middle of the file
+class RecordReader:
+    def __init__(self, source, input_format, text_field):
+        self.source = source
+        self.input_format = input_format
+        self.text_field = text_field
+        self.offset = 0
+        self.header = None
+
+    def _lines(self):
+        # csv.reader pulls one line at a time, so after each record the last
+        # offset recorded here is where that record ends
+        while True:
+            line = self.source.readline()
+            if not line:
+                return
+            self.offset = self.source.tell()
+            yield line.decode("utf-8")
+
+    def records(self, start_offset=0):
+        # Yields (record, text, end offset): lists in header order for CSV, dicts for JSONL
+        lines = self._lines()
+        if self.input_format == "jsonl":
+            self.source.seek(start_offset)
+            for line in lines:
+                if line.strip():
+                    record = json.loads(line)
+                    yield record, str(record.get(self.text_field) or ""), self.offset
+            return
+
+        # The header is always read from the top, also when resuming
+        reader = csv.reader(lines)
+        header = next(reader, None)
+        if header is None:
+            return
+        header[0] = header[0].lstrip("\ufeff")
+        if self.text_field not in header:
+            raise ValueError(f"Input has no '{self.text_field}' column")
+        self.header = header
+        text_index = header.index(self.text_field)
+        if start_offset:
+            self.source.seek(start_offset)
+        for row in reader:
+            if row:
+                yield row, row[text_index] if text_index < len(row) else "", self.offset
+
+def read_batches(records, batch_size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def encode_rows(output_format, columns, rows):
+    # rows are (record, prediction) pairs
+    buffer = io.StringIO()
+    if output_format == "csv":
+        writer = csv.writer(buffer)
+        for record, prediction in rows:
+            if isinstance(record, dict):
+                record = [record.get(column) for column in columns]
+            writer.writerow(list(record) + prediction)
+    else:
+        for record, prediction in rows:
+            if not isinstance(record, dict):
+                record = dict(zip(columns, record))
+            buffer.write(json.dumps({**record, **dict(zip(PREDICTION_FIELDS, prediction))}) + "\n")
+    return buffer.getvalue().encode("utf-8")
+
+def load_checkpoint(path, settings):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint["settings"] != settings:
+        raise ValueError(f"{path} was written with different settings; rerun with --restart to start over")
+    return checkpoint
+
+def save_checkpoint(path, checkpoint):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def score_file(args):
+    input_format = file_format(args.input, args.input_format)
+    output_format = file_format(args.output, args.output_format)
+    checkpoint_path = f"{args.output}.checkpoint"
+    settings = {
+        "input": os.path.abspath(args.input),
+        "input_format": input_format,
+        "output_format": output_format,
+        "text_field": args.text_field
+    }
+
+    checkpoint = None if args.restart else load_checkpoint(checkpoint_path, settings)
+    if checkpoint is None:
+        if os.path.exists(args.output) and not args.restart:
+            print(f"{args.output} exists and has no checkpoint; rerun with --restart to overwrite it")
+            return False
+        checkpoint = {"settings": settings, "columns": None, "input_offset": 0, "output_size": 0, "records": 0}
+    else:
+        print(f"Resuming after {checkpoint['records']} records")
+
+    input_size = os.path.getsize(args.input)
+    start_offset = checkpoint["input_offset"]
+    workers = max(args.workers, 1)
+    max_in_flight = workers * max(args.batches_per_worker, 1)
+
+    with open(args.input, "rb") as source, open(args.output, "ab+") as sink:
+        # Drop output written after the last checkpoint; those records are scored again
+        sink.truncate(checkpoint["output_size"])
+
+        reader = RecordReader(source, input_format, args.text_field)
+        batches = read_batches(reader.records(start_offset), args.batch_size)
+        first_batch = next(batches, None)
+        if checkpoint["columns"] is None:
+            # Output columns: the CSV header, or the keys of the first JSONL record
+            checkpoint["columns"] = reader.header or (list(first_batch[0][0].keys()) if first_batch else [])
+            if output_format == "csv":
+                sink.write(encode_rows("csv", None, [(checkpoint["columns"], PREDICTION_FIELDS)]))
+            sink.flush()
+            checkpoint["output_size"] = sink.tell()
+            save_checkpoint(checkpoint_path, checkpoint)
+        columns = checkpoint["columns"]
+
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_process_worker,
+            initargs=(args.model_dir, args.torch_threads)
+        )
+        batches = itertools.chain([first_batch] if first_batch else [], batches)
+        in_flight = deque()
+        started = last_report = time.perf_counter()
+        scored = 0
+        since_checkpoint = 0
+        try:
+            while True:
+                # Keep every worker busy without reading more than max_in_flight batches ahead
+                while len(in_flight) < max_in_flight:
+                    batch = next(batches, None)
+                    if batch is None:
+                        break
+                    in_flight.append((batch, executor.submit(_score_batch, [text for _, text, _ in batch])))
+                if not in_flight:
+                    break
+
+                batch, future = in_flight.popleft()
+                predictions = future.result()
+                sink.write(encode_rows(output_format, columns, [
+                    (record, prediction) for (record, _, _), prediction in zip(batch, predictions)
+                ]))
+                scored += len(batch)
+                checkpoint["records"] += len(batch)
+                checkpoint["input_offset"] = batch[-1][2]
+
+                since_checkpoint += 1
+                if since_checkpoint >= args.checkpoint_every:
+                    sink.flush()
+                    os.fsync(sink.fileno())
+                    checkpoint["output_size"] = sink.tell()
+                    save_checkpoint(checkpoint_path, checkpoint)
+                    since_checkpoint = 0
+
+                now = time.perf_counter()
+                if now - last_report >= args.progress_seconds:
+                    last_report = now
+                    rate = (checkpoint["input_offset"] - start_offset) / (now - started)
+                    eta = (input_size - checkpoint["input_offset"]) / max(rate, 1e-9)
+                    print(f"{checkpoint['records']} records, {checkpoint['input_offset'] / max(input_size, 1):.1%} "
+                          f"of input, {scored / (now - started):.0f} records/s, ETA {eta:.0f}s")
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        sink.flush()
+        os.fsync(sink.fileno())
+
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    elapsed = time.perf_counter() - started
+    print(f"Done: {checkpoint['records']} records in {args.output} "
+          f"({scored} scored by this run, {scored / max(elapsed, 1e-9):.0f} records/s)")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a CSV or JSONL file of reviews with the sentiment model")
+    parser.add_argument("input", help="CSV with a header row, or JSONL with one object per line")
+    parser.add_argument("output", help="where to write the input records plus their predictions")
+    parser.add_argument("--text-field", default="review_text", help="column or key holding the review text")
+    parser.add_argument("--input-format", choices=("csv", "jsonl"), help="default: from the file extension")
+    parser.add_argument("--output-format", choices=("csv", "jsonl"), help="default: from the file extension")
+    parser.add_argument("--model-dir", default=version_dir(initial_version()),
+                        help="default: the registry's active version (MODEL_REGISTRY_DIR), else MODEL_DIR")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes, each with its own model")
+    parser.add_argument("--torch-threads", type=int, default=1, help="torch threads per worker, 0 for the torch default")
+    parser.add_argument("--batch-size", type=int, default=256, help="texts per model call")
+    parser.add_argument("--batches-per-worker", type=int, default=2, help="batches in flight per worker")
+    parser.add_argument("--checkpoint-every", type=int, default=20, help="batches between checkpoints")
+    parser.add_argument("--progress-seconds", type=float, default=5.0)
+    parser.add_argument("--restart", action="store_true", help="ignore any checkpoint and overwrite the output")
+    args = parser.parse_args()
+    sys.exit(0 if score_file(args) else 1)
@@ -0,0 +1,154 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import gc
+import signal
+import socket
+import time
+from collections import deque
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Prefork launcher: loads the app and the model once in a master process, then
+# forks the workers. The workers share the master's pages (weights, vocabulary,
+# imported modules) copy-on-write instead of each loading a private copy, as
+# `uvicorn --workers N` does. Compare the two with `benchmark.py memory`.
+#
+#   python serve.py --host 0.0.0.0 --port 8000 --workers 4
+#
+# Inference must run in thread mode (INFERENCE_POOL_MODE=thread), since process
+# mode would give every worker its own model again.
+
+SERVE_HOST = os.getenv("SERVE_HOST", "127.0.0.1")
+SERVE_PORT = int(os.getenv("SERVE_PORT", "8000"))
+SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", "2"))
+
+# Crashed workers are restarted after a delay that doubles with every crash in
+# the window; once SERVE_MAX_CRASHES happen within the window the master stops,
+# rather than re-forking a worker that dies on startup in a tight loop
+SERVE_RESTART_DELAY_SECONDS = float(os.getenv("SERVE_RESTART_DELAY_SECONDS", "1"))
+SERVE_RESTART_MAX_DELAY_SECONDS = float(os.getenv("SERVE_RESTART_MAX_DELAY_SECONDS", "30"))
+SERVE_MAX_CRASHES = int(os.getenv("SERVE_MAX_CRASHES", "10"))
+SERVE_CRASH_WINDOW_SECONDS = float(os.getenv("SERVE_CRASH_WINDOW_SECONDS", "60"))
+
+def bind_socket(host, port):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+def run_worker(app, sock, torch_threads):
+    import uvicorn
+
+    # The master ran single-threaded, so no intra-op pool exists yet; the
+    # first forward pass (the warm-up) starts one of this size in each worker
+    import torch
+    torch.set_num_threads(torch_threads)
+
+    config = uvicorn.Config(app, log_level="info", lifespan="on")
+    uvicorn.Server(config).run(sockets=[sock])
+
+def spawn_worker(app, sock, torch_threads):
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        exit_code = 0
+        try:
+            run_worker(app, sock, torch_threads)
+        except Exception as e:
+            print(f"Worker {os.getpid()} failed: {e}")
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+    return pid
+
+def serve(host, port, workers):
+    from inference_pool import INFERENCE_POOL_MODE, INFERENCE_TORCH_THREADS
+    if INFERENCE_POOL_MODE != "thread":
+        raise SystemExit("serve.py needs INFERENCE_POOL_MODE=thread")
+
+    sock = bind_socket(host, port)
+    from main import app
+
+    # Gate tables and the compiled backends run torch ops while loading. Run
+    # with more than one thread, those start the intra-op thread pool, which
+    # does not survive a fork: the workers would hang on their first parallel
+    # op. So the master preloads single-threaded and the workers size the pool.
+    import torch
+    from model_manager import preload_model
+    worker_threads = INFERENCE_TORCH_THREADS if INFERENCE_TORCH_THREADS > 0 else torch.get_num_threads()
+    torch.set_num_threads(1)
+    start = time.perf_counter()
+    preload_model()
+    print(f"Model preloaded in {time.perf_counter() - start:.2f}s")
+
+    # Move everything allocated so far out of the collector's reach, so
+    # collections in the workers do not write to (and un-share) those pages
+    gc.collect()
+    gc.freeze()
+
+    children = {spawn_worker(app, sock, worker_threads) for _ in range(workers)}
+    print(f"Master {os.getpid()} serving http://{host}:{port} with workers {sorted(children)}")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    crashes = deque()
+    gave_up = False
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if stopping:
+            continue
+
+        now = time.monotonic()
+        crashes.append(now)
+        while crashes[0] < now - SERVE_CRASH_WINDOW_SECONDS:
+            crashes.popleft()
+        if len(crashes) >= SERVE_MAX_CRASHES:
+            print(f"Worker {pid} exited with status {status}; {len(crashes)} crashes in "
+                  f"{SERVE_CRASH_WINDOW_SECONDS:g}s, shutting down")
+            gave_up = True
+            stop(None, None)
+            continue
+
+        # Replace crashed workers; the new one forks from the same preloaded state
+        delay = min(SERVE_RESTART_DELAY_SECONDS * 2 ** (len(crashes) - 1), SERVE_RESTART_MAX_DELAY_SECONDS)
+        print(f"Worker {pid} exited with status {status}, restarting in {delay:g}s")
+        deadline = now + delay
+        while not stopping and time.monotonic() < deadline:
+            time.sleep(0.1)
+        if not stopping:
+            children.add(spawn_worker(app, sock, worker_threads))
+
+    sock.close()
+    if gave_up:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the app from preforked workers sharing one model")
+    parser.add_argument("--host", default=SERVE_HOST)
+    parser.add_argument("--port", type=int, default=SERVE_PORT)
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS)
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers)
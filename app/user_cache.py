@@ -0,0 +1,64 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Cache settings
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+
+# Fields kept per user; the password hash is never cached
+CACHED_USER_FIELDS = ("id", "name", "email", "role")
+
+# LRU + TTL cache of user rows by email, for the lookups that the session and
+# token claims do not cover. Code that changes a user calls invalidate(); other
+# processes (e.g. create_admin.py) see their changes once the TTL expires.
+class UserCache:
+    def __init__(self, ttl_seconds=USER_CACHE_TTL_SECONDS, max_entries=USER_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, email: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[email]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(email)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, user: Dict[str, Any]):
+        if self.ttl_seconds <= 0:
+            return
+        cached = {field: user.get(field) for field in CACHED_USER_FIELDS}
+        with self._lock:
+            self._entries[user["email"]] = (time.monotonic() + self.ttl_seconds, cached)
+            self._entries.move_to_end(user["email"])
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, email: str):
+        with self._lock:
+            self._entries.pop(email, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+# Shared by the request handlers (async_crud) and the sync helpers (crud, auth)
+user_cache = UserCache()
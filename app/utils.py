@@ -2,9 +2,6 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 import re
-import pandas as pd
-import numpy as np
-from tensorflow.keras.preprocessing.sequence import pad_sequences
 
 class LSTMClassifier(nn.Module):
     def __init__(self, vocab_size, embedding_dim, hidden_dim, output_dim, max_len):
@@ -16,8 +13,12 @@ class LSTMClassifier(nn.Module):
         self.dropout2 = nn.Dropout(0.5)
         self.fc2 = nn.Linear(64, output_dim)
 
-    def forward(self, x):
+    def forward(self, x, lengths=None):
         x = self.embedding(x)
+        if lengths is not None:
+            # Packed sequences stop each row at its real length, so hidden[-1]
+            # is the state after the last token rather than after the padding
+            x = nn.utils.rnn.pack_padded_sequence(x, lengths.cpu(), batch_first=True, enforce_sorted=False)
         _, (hidden, _) = self.lstm(x)
         x = hidden[-1]
         x = self.dropout1(x)
@@ -26,12 +27,33 @@ class LSTMClassifier(nn.Module):
         x = self.fc2(x)
         return x
 
+# Precompiled patterns for clean_text
+TAG_PATTERN = re.compile(r'<.*?>')
+URL_PATTERN = re.compile(r'http\S+')
+NON_LETTER_PATTERN = re.compile(r'[^a-zA-Z\s]+')
+
+# ASCII bytes that are neither letters nor whitespace, deleted in one translate pass
+ASCII_NON_LETTERS = bytes(c for c in range(128) if not (chr(c).isalpha() or chr(c).isspace()))
+
 def clean_text(text):
     if not isinstance(text, str):
         return ""
     text = text.lower()
-    text = re.sub(r'<.*?>', '', text)
-    text = re.sub(r'http\S+', '', text)
-    text = re.sub(r'[^a-zA-Z\s]', '', text)
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
\ No newline at end of file
+
+    # Tags and URLs are rare, so skip their regexes unless they can match
+    if '<' in text:
+        text = TAG_PATTERN.sub('', text)
+    if 'http' in text:
+        text = URL_PATTERN.sub('', text)
+
+    # Drop everything except letters and whitespace
+    if text.isascii():
+        text = text.encode('ascii').translate(None, ASCII_NON_LETTERS).decode('ascii')
+    else:
+        text = NON_LETTER_PATTERN.sub('', text)
+
+    # Collapse whitespace runs (str.split uses the same whitespace set as \s)
+    return ' '.join(text.split())
+
+def clean_texts(texts):
+    return [clean_text(text) for text in texts]
\ No newline at end of file
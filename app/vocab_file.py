@@ -0,0 +1,135 @@
+import functools
+import json
+import mmap
+import struct
+import sys
+import zlib
+
+# Compact, memory-mappable vocabulary file.
+#
+# Layout (little-endian):
+#   header      magic, version, word count, slot count, config length
+#   config      tokenizer settings as UTF-8 JSON, padded to 4 bytes
+#   slots       uint32[slot count]   open-addressing hash table, word number + 1 (0 = empty)
+#   offsets     uint32[words + 1]    start of each word in the string table
+#   ids         int32[words]         token id of each word
+#   strings     UTF-8 words, back to back
+#
+# Lookups hash the word with crc32 and probe the slot table, so the file is
+# used in place: every worker maps the same pages from the page cache and
+# nothing is unpickled or copied into Python dicts.
+
+MAGIC = b"PFVOCAB\0"
+VERSION = 1
+HEADER = struct.Struct("<8sIIII")
+LOOKUP_CACHE_SIZE = 4096
+
+def _slot_count(n_words):
+    # Keep the load factor at or below 0.5 so probe chains stay short
+    n_slots = 1
+    while n_slots < max(n_words * 2, 1):
+        n_slots *= 2
+    return n_slots
+
+def _align(n):
+    return (n + 3) & ~3
+
+def write_vocab_file(path, word_index, config):
+    words = list(word_index.keys())
+    encoded = [word.encode("utf-8", "surrogatepass") for word in words]
+    n_words = len(words)
+    n_slots = _slot_count(n_words)
+    mask = n_slots - 1
+
+    slots = [0] * n_slots
+    for number, word in enumerate(encoded):
+        h = zlib.crc32(word) & mask
+        while slots[h]:
+            h = (h + 1) & mask
+        slots[h] = number + 1
+
+    offsets = [0]
+    for word in encoded:
+        offsets.append(offsets[-1] + len(word))
+
+    config_bytes = json.dumps(config).encode("utf-8")
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, n_words, n_slots, len(config_bytes)))
+        f.write(config_bytes.ljust(_align(len(config_bytes)), b"\0"))
+        f.write(struct.pack(f"<{n_slots}I", *slots))
+        f.write(struct.pack(f"<{n_words + 1}I", *offsets))
+        f.write(struct.pack(f"<{n_words}i", *(word_index[word] for word in words)))
+        f.write(b"".join(encoded))
+
+# Read-only word -> id mapping backed by a memory-mapped vocabulary file
+class MappedVocabulary:
+    def __init__(self, path):
+        if sys.byteorder != "little":
+            raise RuntimeError("Mapped vocabularies are only supported on little-endian hosts")
+
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, n_words, n_slots, config_len = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} vocabulary file")
+
+        pos = HEADER.size
+        self.config = json.loads(self._mm[pos:pos + config_len].decode("utf-8"))
+        pos += _align(config_len)
+
+        view = memoryview(self._mm)
+        self._slots = view[pos:pos + 4 * n_slots].cast("I")
+        pos += 4 * n_slots
+        self._offsets = view[pos:pos + 4 * (n_words + 1)].cast("I")
+        pos += 4 * (n_words + 1)
+        self._ids = view[pos:pos + 4 * n_words].cast("i")
+        pos += 4 * n_words
+        self._strings = pos
+
+        self._n_words = n_words
+        self._mask = n_slots - 1
+
+        # Frequent words are looked up over and over; a small per-process
+        # cache keeps them at dict speed while the table itself stays shared
+        self._cached_lookup = functools.lru_cache(maxsize=LOOKUP_CACHE_SIZE)(self._lookup)
+
+    def get(self, word, default=None):
+        value = self._cached_lookup(word)
+        return default if value is None else value
+
+    def _lookup(self, word):
+        encoded = word.encode("utf-8", "surrogatepass")
+        slots = self._slots
+        offsets = self._offsets
+        h = zlib.crc32(encoded) & self._mask
+
+        while True:
+            slot = slots[h]
+            if not slot:
+                return None
+            number = slot - 1
+            start = self._strings + offsets[number]
+            end = self._strings + offsets[number + 1]
+            if self._mm[start:end] == encoded:
+                return self._ids[number]
+            h = (h + 1) & self._mask
+
+    def __getitem__(self, word):
+        value = self.get(word)
+        if value is None:
+            raise KeyError(word)
+        return value
+
+    def __contains__(self, word):
+        return self.get(word) is not None
+
+    def __len__(self):
+        return self._n_words
+
+    def items(self):
+        for number in range(self._n_words):
+            start = self._strings + self._offsets[number]
+            end = self._strings + self._offsets[number + 1]
+            yield self._mm[start:end].decode("utf-8", "surrogatepass"), self._ids[number]